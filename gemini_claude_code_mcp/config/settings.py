@@ -1,10 +1,24 @@
 """Configuration settings for Gemini-Claude Code MCP server."""
 
+from functools import lru_cache
+from pathlib import Path
 from typing import Literal, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+_VALID_GEMINI_MODELS: frozenset[str] = frozenset(
+    {
+        'gemini-2.0-flash-exp',
+        'gemini-1.5-pro',
+        'gemini-1.5-pro-002',
+        'gemini-1.5-flash',
+        'gemini-1.5-flash-002',
+        'gemini-1.5-flash-8b',
+        'gemini-2.5-pro-preview-06-05',
+    }
+)
+
 
 class GeminiSettings(BaseSettings):
     """Settings for Google Gemini API."""
@@ -15,22 +29,20 @@ class GeminiSettings(BaseSettings):
     temperature: float = Field(default=0.1, ge=0.0, le=2.0, description='Temperature for generation')
     timeout: int = Field(default=300, description='API timeout in seconds')
     max_output_tokens: int = Field(default=1000, ge=1, le=2000000, description='Maximum output tokens per request')
+    max_concurrency: int = Field(default=8, ge=1, le=100, description='Maximum concurrent Gemini requests per analysis')
+    circuit_breaker_threshold: int = Field(
+        default=5, ge=1, description='Consecutive server errors or timeouts that open the circuit breaker'
+    )
+    circuit_breaker_cooldown: float = Field(
+        default=30.0, ge=0.0, description='Seconds the circuit breaker stays open before allowing a probe request'
+    )
 
     @field_validator('model')
     @classmethod
     def validate_model(cls, v: str) -> str:
         """Validate that the model is a supported Gemini model."""
-        valid_models = [
-            'gemini-2.0-flash-exp',
-            'gemini-1.5-pro',
-            'gemini-1.5-pro-002',
-            'gemini-1.5-flash',
-            'gemini-1.5-flash-002',
-            'gemini-1.5-flash-8b',
-            'gemini-2.5-pro-preview-06-05',  # Add newer model
-        ]
-        if v not in valid_models:
-            raise ValueError(f'Model must be one of {valid_models}')
+        if v not in _VALID_GEMINI_MODELS:
+            raise ValueError(f'Model must be one of {sorted(_VALID_GEMINI_MODELS)}')
         return v
 
 
@@ -41,6 +53,10 @@ class CacheSettings(BaseSettings):
     ttl: int = Field(default=3600, description='Cache time-to-live in seconds')
     max_size_gb: float = Field(default=1.0, description='Maximum cache size in GB')
     eviction_policy: Literal['lru', 'lfu', 'fifo'] = Field(default='lru', description='Cache eviction policy')
+    directory: Path = Field(
+        default_factory=lambda: Path.home() / '.cache' / 'gemini-claude-code-mcp',
+        description='Directory of the disk cache for analysis results',
+    )
 
 
 class ProcessingSettings(BaseSettings):
@@ -49,44 +65,54 @@ class ProcessingSettings(BaseSettings):
     chunk_size: int = Field(default=100000, description='Size of context chunks in tokens')
     overlap: int = Field(default=1000, description='Overlap between chunks in tokens')
     parallel_chunks: int = Field(default=4, ge=1, le=10, description='Number of chunks to process in parallel')
-    file_extensions: list[str] = Field(
-        default=[
-            '.py',
-            '.js',
-            '.ts',
-            '.jsx',
-            '.tsx',
-            '.java',
-            '.cpp',
-            '.c',
-            '.h',
-            '.hpp',
-            '.cs',
-            '.go',
-            '.rs',
-            '.rb',
-            '.php',
-            '.swift',
-            '.kt',
-            '.scala',
-            '.r',
-            '.m',
-            '.mm',
-            '.md',
-            '.txt',
-            '.json',
-            '.yaml',
-            '.yml',
-            '.toml',
-            '.xml',
-            '.html',
-            '.css',
-            '.scss',
-        ],
+    max_file_tokens: int = Field(
+        default=100000,
+        ge=1,
+        description=(
+            'Files estimated above this many tokens (at four characters per token, before exact tokenization) are '
+            'left out of project analysis'
+        ),
+    )
+    file_extensions: frozenset[str] = Field(
+        default=frozenset(
+            {
+                '.py',
+                '.js',
+                '.ts',
+                '.jsx',
+                '.tsx',
+                '.java',
+                '.cpp',
+                '.c',
+                '.h',
+                '.hpp',
+                '.cs',
+                '.go',
+                '.rs',
+                '.rb',
+                '.php',
+                '.swift',
+                '.kt',
+                '.scala',
+                '.r',
+                '.m',
+                '.mm',
+                '.md',
+                '.txt',
+                '.json',
+                '.yaml',
+                '.yml',
+                '.toml',
+                '.xml',
+                '.html',
+                '.css',
+                '.scss',
+            }
+        ),
         description='File extensions to include in analysis',
     )
-    ignore_patterns: list[str] = Field(
-        default=[
+    ignore_patterns: tuple[str, ...] = Field(
+        default=(
             '__pycache__',
             '.git',
             '.venv',
@@ -98,7 +124,7 @@ class ProcessingSettings(BaseSettings):
             'dist',
             'build',
             '.DS_Store',
-        ],
+        ),
         description='Patterns to ignore during file traversal',
     )
 
@@ -153,5 +179,11 @@ class Settings(BaseSettings):
     cache_ttl_seconds: int = Field(default=3600, description='Cache TTL in seconds')
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the cached settings instance, parsing the environment only once."""
+    return Settings()
+
+
 # Create a singleton settings instance
-settings = Settings()
+settings = get_settings()
@@ -1,15 +1,15 @@
 """Main entry point for Gemini-Claude Code MCP server."""
 
 import sys
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import click
-from rich.console import Console
 
 from gemini_claude_code_mcp.mcp_server.server import mcp
 from gemini_claude_code_mcp.utils.logging import get_logger, setup_logging
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
 
 
 @click.command()
@@ -28,8 +28,14 @@ def main(log_level: str, log_file: Optional[str], no_rich: bool):
 
     logger = get_logger(__name__)
 
-    # Welcome message
+    # Rich is only imported when console output is enabled
+    console: Optional[Console] = None
     if not no_rich:
+        from rich.console import Console as RichConsole
+
+        console = RichConsole()
+
+        # Welcome message
         console.print('[bold cyan]🚀 Gemini-Claude Code MCP Server[/bold cyan]', justify='center')
         console.print("Bridging Claude Code with Google Gemini's massive context window", justify='center', style='dim')
         console.print()
@@ -43,11 +49,11 @@ def main(log_level: str, log_file: Optional[str], no_rich: bool):
         mcp.run()
     except KeyboardInterrupt:
         logger.info('Server stopped by user')
-        if not no_rich:
+        if console is not None:
             console.print('\n[yellow]Server stopped by user[/yellow]')
     except Exception as e:
         logger.error('Server error', error=str(e), exc_info=True)
-        if not no_rich:
+        if console is not None:
             console.print(f'\n[red]Server error: {e}[/red]')
         sys.exit(1)
 
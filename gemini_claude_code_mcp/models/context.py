@@ -1,7 +1,9 @@
 """Context models for managing large code contexts."""
 
+import hashlib
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
 from pathlib import Path
 from typing import Any
 
@@ -44,6 +46,12 @@ class AnalysisRequest(BaseModel):
     content: str = Field(description='Content to analyze')
     chunking_strategy: ChunkingStrategy = Field(default=ChunkingStrategy.CODE_AWARE, description='Chunking strategy')
     context_metadata: dict[str, Any] = Field(default_factory=dict, description='Additional context metadata')
+    total_tokens: int | None = Field(default=None, description='Precomputed token count of the content, if known')
+
+    @cached_property
+    def content_hash(self) -> str:
+        """SHA-256 hex digest of the content, computed once per request."""
+        return hashlib.sha256(self.content.encode()).hexdigest()
 
 
 class AnalysisResult(BaseModel):
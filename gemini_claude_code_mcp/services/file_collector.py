@@ -1,27 +1,103 @@
 """File collector service for discovering and loading files."""
 
+import asyncio
 import fnmatch
 import os
-from collections.abc import AsyncIterator
+import re
+from collections.abc import AsyncIterator, Iterator
+from functools import lru_cache
 from pathlib import Path
 
-import aiofiles
-from git import InvalidGitRepositoryError, Repo
+import pathspec
 
-from gemini_claude_code_mcp.config.settings import settings
+from gemini_claude_code_mcp.config.settings import get_settings
 from gemini_claude_code_mcp.models.context import CollectedFile, FilePattern
-from gemini_claude_code_mcp.utils.chunking import count_tokens, get_language_from_extension
+from gemini_claude_code_mcp.utils.chunking import count_tokens, count_tokens_batch, get_language_from_extension
 from gemini_claude_code_mcp.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Number of leading bytes inspected for NUL bytes to detect binary files
+BINARY_SNIFF_BYTES = 4096
+
+
+# (full path regex, basename regex) union for a set of patterns
+CompiledPatterns = tuple[re.Pattern[str] | None, re.Pattern[str] | None]
+
+
+@lru_cache(maxsize=1024)
+def _compiled_glob(pattern: str) -> re.Pattern[str]:
+    """Translate and compile a glob pattern once per process."""
+    return re.compile(fnmatch.translate(pattern))
+
+
+@lru_cache(maxsize=64)
+def _compile_patterns(patterns: frozenset[str]) -> CompiledPatterns:
+    """Compile patterns into a (full path, basename) pair of regex unions.
+
+    A glob matches the full path or the basename, a pattern ending in `/` matches a path prefix or a directory
+    basename, and any other pattern matches as a substring of the path. A path can then be tested against every
+    include pattern with at most two regex matches.
+    """
+    path_parts: list[str] = []
+    basename_parts: list[str] = []
+
+    for pattern in patterns:
+        # Handle glob patterns
+        if '*' in pattern or '?' in pattern or '[' in pattern:
+            translated = _compiled_glob(pattern).pattern
+            path_parts.append(translated)
+            basename_parts.append(translated)
+        # Handle directory patterns
+        elif pattern.endswith('/'):
+            path_parts.append(re.escape(pattern))
+            basename_parts.append(re.escape(pattern[:-1]) + r'\Z')
+        # Handle exact matches (a substring match also covers an equal basename)
+        else:
+            path_parts.append(r'(?s:.*)' + re.escape(pattern))
+
+    path_re = re.compile('|'.join(f'(?:{part})' for part in path_parts)) if path_parts else None
+    basename_re = re.compile('|'.join(f'(?:{part})' for part in basename_parts)) if basename_parts else None
+    return path_re, basename_re
+
+
+def _read_text_bytes(file_path: str) -> bytes | None:
+    """Read a file's bytes, returning None if its head contains a NUL byte (binary content)."""
+    with open(file_path, 'rb') as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+        if b'\x00' in head:
+            return None
+        if len(head) < BINARY_SNIFF_BYTES:
+            return head
+        return head + f.read()
+
+
+@lru_cache(maxsize=64)
+def _compile_ignore_spec(patterns: tuple[str, ...]) -> pathspec.GitIgnoreSpec:
+    """Compile ignore patterns into a single gitignore-style matcher."""
+    return pathspec.GitIgnoreSpec.from_lines(patterns)
+
+
+@lru_cache(maxsize=32)
+def _gitignore_for(gitignore_path: str, mtime_ns: int) -> tuple[str, ...]:
+    """Parse a .gitignore file into its patterns (in file order), cached per path and modification time."""
+    patterns: list[str] = []
+    with open(gitignore_path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                patterns.append(line)
+    return tuple(patterns)
+
 
 class FileCollector:
     """Service for collecting files based on patterns."""
 
     def __init__(self):
-        self.supported_extensions = set(settings.processing.file_extensions)
-        self.ignore_patterns = set(settings.processing.ignore_patterns)
+        settings = get_settings()
+        self.max_concurrent_reads = settings.processing.parallel_chunks * 4
+        self.supported_extensions = settings.processing.file_extensions
+        self.ignore_patterns = settings.processing.ignore_patterns
 
     async def collect_files(self, root_path: str, pattern: FilePattern) -> list[CollectedFile]:
         """Collect files matching the pattern from root path."""
@@ -31,80 +107,126 @@ class FileCollector:
             raise ValueError(f'Path does not exist: {root}')
 
         # Get gitignore patterns if requested
-        gitignore_patterns: set[str] = set()
+        gitignore_patterns: list[str] = []
         if pattern.respect_gitignore:
             gitignore_patterns = self._load_gitignore_patterns(root)
 
-        # Combine all ignore patterns
-        all_ignore_patterns = self.ignore_patterns | gitignore_patterns | set(pattern.exclude)
+        # Combine all ignore patterns (order matters for gitignore-style negations)
+        all_ignore_patterns = [*self.ignore_patterns, *gitignore_patterns, *pattern.exclude]
+
+        # Discover files, then load them concurrently with a bounded number of reads in flight
+        discovered = [item async for item in self._discover_files(root, pattern.include, all_ignore_patterns)]
+        semaphore = asyncio.Semaphore(self.max_concurrent_reads)
+
+        async def load_guarded(entry: os.DirEntry[str], relative_path: str) -> CollectedFile | None:
+            async with semaphore:
+                return await self._load_file(entry, relative_path)
+
+        results = await asyncio.gather(
+            *(load_guarded(entry, relative_path) for entry, relative_path in discovered), return_exceptions=True
+        )
 
-        # Collect files
         collected_files: list[CollectedFile] = []
-        async for file_path in self._discover_files(root, pattern.include, all_ignore_patterns):
-            try:
-                collected_file = await self._load_file(file_path, root)
-                if collected_file:
-                    collected_files.append(collected_file)
-            except Exception as e:
-                logger.warning(f'Failed to load file {file_path}: {e}')
+        for (entry, _), result in zip(discovered, results):
+            if isinstance(result, BaseException):
+                logger.warning(f'Failed to load file {entry.path}: {result}')
+            elif result:
+                collected_files.append(result)
 
         logger.info(f'Collected {len(collected_files)} files from {root}')
         return collected_files
 
     async def _discover_files(
-        self, root: Path, include_patterns: list[str], ignore_patterns: set[str]
-    ) -> AsyncIterator[Path]:
-        """Discover files matching patterns."""
+        self, root: Path, include_patterns: list[str], ignore_patterns: list[str]
+    ) -> AsyncIterator[tuple[os.DirEntry[str], str]]:
+        """Discover files matching patterns, yielding (entry, relative_path) tuples."""
         # If no include patterns, include all supported files
+        required_suffixes: tuple[str, ...] | None = None
         if not include_patterns:
             include_patterns = [f'**/*{ext}' for ext in self.supported_extensions]
+            # The default patterns can only match supported extensions, so reject anything else up front
+            required_suffixes = tuple(self.supported_extensions)
 
-        # Use asyncio to walk directory tree
-        for dirpath, dirnames, filenames in os.walk(root):
-            current_dir = Path(dirpath)
+        # Compile each pattern set once instead of re-translating globs for every path
+        ignore_spec = _compile_ignore_spec(tuple(ignore_patterns))
+        compiled_include = _compile_patterns(frozenset(include_patterns))
 
-            # Filter out ignored directories
-            dirnames[:] = [
-                d for d in dirnames if not any(self._matches_pattern(d, pattern) for pattern in ignore_patterns)
-            ]
+        for entry, relative_path in self._walk(str(root), '', ignore_spec):
+            if required_suffixes is not None and not entry.name.endswith(required_suffixes):
+                continue
 
-            # Check files
-            for filename in filenames:
-                file_path = current_dir / filename
-                relative_path = file_path.relative_to(root)
+            # Skip if matches ignore pattern
+            if ignore_spec.match_file(relative_path):
+                continue
 
-                # Skip if matches ignore pattern
-                if any(self._matches_pattern(str(relative_path), pattern) for pattern in ignore_patterns):
-                    continue
+            # Check if matches include pattern
+            if self._matches_any(relative_path, compiled_include):
+                yield entry, relative_path
 
-                # Check if matches include pattern
-                if any(self._matches_pattern(str(relative_path), pattern) for pattern in include_patterns):
-                    yield file_path
+    def _walk(
+        self, directory: str, relative_dir: str, ignore_spec: pathspec.GitIgnoreSpec
+    ) -> Iterator[tuple[os.DirEntry[str], str]]:
+        """Walk the tree top-down with os.scandir, pruning ignored directories before descending.
 
-    async def _load_file(self, file_path: Path, root: Path) -> CollectedFile | None:
+        Mirrors os.walk ordering (files of a directory before its subdirectories) and does not follow
+        directory symlinks. The yielded DirEntry caches its stat result for the loader.
+        """
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return
+
+        subdirs: list[tuple[str, str]] = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if not is_dir:
+                yield entry, relative_dir + entry.name
+            elif not entry.is_symlink():
+                subdir_relative = f'{relative_dir}{entry.name}{os.sep}'
+                # The trailing separator lets directory-only patterns such as `__pycache__/` match
+                if not ignore_spec.match_file(subdir_relative):
+                    subdirs.append((entry.path, subdir_relative))
+
+        for subdir_path, subdir_relative in subdirs:
+            yield from self._walk(subdir_path, subdir_relative, ignore_spec)
+
+    async def _load_file(self, entry: os.DirEntry[str], relative_path: str) -> CollectedFile | None:
         """Load a file and create CollectedFile object."""
+        file_path = entry.path
         try:
-            # Get file stats
-            stat = file_path.stat()
+            # Get file stats (cached on the directory entry)
+            stat = entry.stat()
 
             # Skip very large files (>10MB)
             if stat.st_size > 10 * 1024 * 1024:
                 logger.warning(f'Skipping large file: {file_path} ({stat.st_size} bytes)')
                 return None
 
-            # Read file content
-            async with aiofiles.open(file_path, encoding='utf-8', errors='ignore') as f:  # type: ignore
-                content = await f.read()
+            # Read file content in a worker thread and decode like a text-mode open (universal newlines)
+            data = await asyncio.get_running_loop().run_in_executor(None, _read_text_bytes, file_path)
+            if data is None:
+                logger.debug(f'Skipping binary file: {file_path}')
+                return None
+
+            content = data.decode('utf-8', errors='ignore')
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
 
-            # Count tokens
-            token_count = count_tokens(content)
+            # Estimate tokens cheaply; callers that report or pack by tokens refine with count_precise_tokens
+            token_count = count_tokens(content, precise=False)
 
             # Detect language
-            language = get_language_from_extension(str(file_path))
+            language = get_language_from_extension(file_path)
 
-            return CollectedFile(
-                path=str(file_path),
-                relative_path=str(file_path.relative_to(root)),
+            # Every field comes straight from the filesystem with the right type, so skip validation
+            return CollectedFile.model_construct(
+                path=file_path,
+                relative_path=relative_path,
                 content=content,
                 size=stat.st_size,
                 token_count=token_count,
@@ -112,42 +234,36 @@ class FileCollector:
                 relevance_score=0.0,  # Will be set by relevance scoring
             )
 
-        except Exception as e:
+        except (OSError, UnicodeDecodeError) as e:
             logger.error(f'Error loading file {file_path}: {e}')
             return None
 
-    def _load_gitignore_patterns(self, root: Path) -> set[str]:
-        """Load patterns from .gitignore files."""
-        patterns: set[str] = set()
-
+    def _load_gitignore_patterns(self, root: Path) -> list[str]:
+        """Load patterns from the root .gitignore file."""
+        gitignore_path = root / '.gitignore'
         try:
-            repo = Repo(root)
-            # Get patterns from git's exclude info
-            for item in repo.ignored(root):
-                patterns.add(str(Path(item).relative_to(root)))
-        except InvalidGitRepositoryError:
-            # Not a git repo, check for .gitignore file
-            gitignore_path = root / '.gitignore'
-            if gitignore_path.exists():
-                with open(gitignore_path) as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            patterns.add(line)
-
-        return patterns
-
-    def _matches_pattern(self, path: str, pattern: str) -> bool:
-        """Check if path matches pattern."""
-        # Handle glob patterns
-        if '*' in pattern or '?' in pattern or '[' in pattern:
-            return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(os.path.basename(path), pattern)
-        # Handle directory patterns
-        elif pattern.endswith('/'):
-            return path.startswith(pattern) or os.path.basename(path) == pattern[:-1]
-        # Handle exact matches
-        else:
-            return pattern in path or os.path.basename(path) == pattern
+            mtime_ns = gitignore_path.stat().st_mtime_ns
+        except OSError:
+            return []
+
+        return list(_gitignore_for(str(gitignore_path), mtime_ns))
+
+    def _matches_any(self, path: str, compiled: CompiledPatterns) -> bool:
+        """Check if path matches any of the compiled patterns."""
+        path_re, basename_re = compiled
+        if path_re is not None and path_re.match(path):
+            return True
+        return basename_re is not None and basename_re.match(os.path.basename(path)) is not None
+
+    async def count_precise_tokens(self, files: list[CollectedFile]) -> list[CollectedFile]:
+        """Replace the estimated token counts of the given files with exact tokenizer counts.
+
+        All files are tokenized in one batch on a worker thread so the event loop is not blocked.
+        """
+        token_counts = await asyncio.to_thread(count_tokens_batch, [file.content for file in files])
+        for file, token_count in zip(files, token_counts):
+            file.token_count = token_count
+        return files
 
     async def score_relevance(self, files: list[CollectedFile], query: str) -> list[CollectedFile]:
         """Score files by relevance to query."""
@@ -2,196 +2,361 @@
 #
 # Type annotations for Google Generative AI SDK:
 # 1. generate_content() returns: types.GenerateContentResponse
-# 2. generate_content_stream() returns: AsyncIterator[types.GenerateContentResponse]
+# 2. generate_content_stream() is awaited and returns: AsyncIterator[types.GenerateContentResponse]
 # 3. GenerateContentResponse.text is a property that returns Optional[str]
 #    - It concatenates all text parts in the response
 #    - Returns None if there's no text content
 # 4. Each chunk in the stream is also a GenerateContentResponse object
 
 import asyncio
+import importlib.util
+import random
 import time
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from google import genai
-from google.genai import types
-from google.genai.errors import ClientError, ServerError
+import httpx
 
-from gemini_claude_code_mcp.config.settings import settings
+from gemini_claude_code_mcp.config.settings import get_settings
 from gemini_claude_code_mcp.utils.logging import get_logger
 
+# google.genai takes around a second to import, so it is imported where it is used rather than at server startup
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
 logger = get_logger(__name__)
 
-gemini_client = genai.Client(api_key=settings.gemini.api_key)
+# Upper bound on open connections in the pool shared by all Gemini calls made through the async client
+GEMINI_MAX_CONNECTIONS = 50
+# Idle connections are dropped before the server's own ~60s keep-alive timeout can close them mid-request
+GEMINI_KEEPALIVE_EXPIRY = 50.0
+
+
+@lru_cache(maxsize=1)
+def get_gemini_client() -> 'genai.Client':
+    """Return the shared Gemini client, constructing it on first use.
 
-# Rate limiting state
-rate_limit_state: dict[str, int | float | asyncio.Lock] = {
-    'request_count': 0,
-    'window_start': time.time(),
-    'lock': asyncio.Lock(),
-}
+    The async transport keeps a pooled set of connections and multiplexes requests over HTTP/2 when the
+    optional `h2` package is installed. Enough connections stay alive to serve `max_concurrency` chunk
+    requests without new TLS handshakes.
+    """
+    from google import genai
+    from google.genai import types
+
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_keepalive_connections=settings.gemini.max_concurrency,
+        max_connections=max(GEMINI_MAX_CONNECTIONS, settings.gemini.max_concurrency),
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+    http_options = types.HttpOptions(
+        timeout=settings.gemini.timeout * 1000,  # milliseconds
+        async_client_args={
+            'http2': importlib.util.find_spec('h2') is not None,
+            'limits': limits,
+        },
+    )
+    return genai.Client(api_key=settings.gemini.api_key, http_options=http_options)
+
+
+@lru_cache(maxsize=32)
+def _generate_content_config(
+    system_instruction: tuple[str, ...] | None, temperature: float, max_output_tokens: int
+) -> 'types.GenerateContentConfig':
+    """Return a shared generation config for the given parameters."""
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        system_instruction=list(system_instruction) if system_instruction is not None else None,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        response_mime_type='text/plain',
+    )
+
+
+@dataclass
+class RateLimitState:
+    """Token bucket shared by all Gemini calls; the lock only guards the token update, never a sleep."""
+
+    tokens: float
+    last_refill: float
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    clock: Callable[[], float] = time.monotonic
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+
+
+# Rate limiting state (starts with a full bucket)
+rate_limit_state = RateLimitState(tokens=float(get_settings().rate_limit_requests), last_refill=time.monotonic())
 
 
 async def check_rate_limit() -> None:
-    """Check and enforce rate limiting."""
-    lock = rate_limit_state['lock']
-    assert isinstance(lock, asyncio.Lock)
+    """Check and enforce rate limiting.
 
-    async with lock:
-        current_time = time.time()
-        window_start = rate_limit_state['window_start']
-        assert isinstance(window_start, (int, float))
-        window_elapsed = current_time - window_start
+    Tokens refill continuously at `rate_limit_requests / rate_limit_window` per second up to a capacity of
+    `rate_limit_requests`. A caller that finds the bucket empty sleeps only for its own refill time.
+    """
+    settings = get_settings()
+    capacity = float(settings.rate_limit_requests)
+    refill_rate = settings.rate_limit_requests / settings.rate_limit_window
 
-        if window_elapsed >= settings.rate_limit_window:
-            # Reset the window
-            rate_limit_state['request_count'] = 0
-            rate_limit_state['window_start'] = current_time
+    while True:
+        async with rate_limit_state.lock:
+            now = rate_limit_state.clock()
+            elapsed = now - rate_limit_state.last_refill
+            rate_limit_state.tokens = min(capacity, rate_limit_state.tokens + elapsed * refill_rate)
+            rate_limit_state.last_refill = now
 
-        request_count = rate_limit_state['request_count']
-        assert isinstance(request_count, int)
+            if rate_limit_state.tokens >= 1:
+                rate_limit_state.tokens -= 1
+                return
 
-        if request_count >= settings.rate_limit_requests:
-            # Calculate wait time
-            wait_time = settings.rate_limit_window - window_elapsed
-            logger.warning(f'Rate limit reached, waiting {wait_time:.2f} seconds')
-            await asyncio.sleep(wait_time)
-            # Reset after waiting
-            rate_limit_state['request_count'] = 0
-            rate_limit_state['window_start'] = time.time()
+            wait_time = (1 - rate_limit_state.tokens) / refill_rate
 
-        rate_limit_state['request_count'] = request_count + 1
+        logger.warning(f'Rate limit reached, waiting {wait_time:.2f} seconds')
+        await rate_limit_state.sleep(wait_time)
 
 
-async def gemini_text_to_text(
-    prompt: str,
-    system_instruction: list[str] | None = None,
-    model: str = settings.gemini.model,
-    temperature: float = settings.gemini.temperature,
-    max_output_tokens: int = settings.gemini.max_output_tokens,
-    max_retries: int = 3,
-    initial_retry_delay: float = 1.0,
-) -> str | None:
-    """Generate text using Gemini's text-to-text model with retry logic."""
-    contents = [types.Content(role='user', parts=[types.Part.from_text(text=prompt)])]
+@dataclass
+class RetryBudget:
+    """Token bucket limiting retries: each retry spends a token and each successful call earns part of one back.
 
-    generate_content_config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
-        temperature=temperature,
-        max_output_tokens=max_output_tokens,
-        response_mime_type='text/plain',
-    )
+    While Gemini is flapping the budget drains, so concurrent callers stop retrying instead of multiplying load.
+    """
 
-    retry_delay = initial_retry_delay
-    last_error = None
+    capacity: float = 10.0
+    success_deposit: float = 0.1
+    tokens: float = 10.0
 
-    for attempt in range(max_retries):
-        try:
-            # Check rate limit before making request
-            await check_rate_limit()
+    def consume(self) -> bool:
+        """Spend a token for a retry, returning False if the budget is exhausted."""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
 
-            logger.debug(f'Attempting Gemini API call (attempt {attempt + 1}/{max_retries})')
+    def deposit(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.success_deposit)
 
-            response = await gemini_client.aio.models.generate_content(  # type: ignore[attr-defined]
-                model=model,
-                contents=contents,
-                config=generate_content_config,
-            )
 
-            logger.debug('Gemini API call successful')
-            # response.text is Optional[str] - returns None if no text content
-            return response.text
+# Retry budget shared by all Gemini calls
+retry_budget = RetryBudget()
 
-        except ServerError as e:
-            last_error = e
-            # Check if this is a rate limit error (usually 429 status code)
-            if 'rate' in str(e).lower() or '429' in str(e):
-                logger.warning(f'Rate limit error from Gemini API: {e}')
-                # Use exponential backoff with jitter
-                wait_time = retry_delay * (2**attempt) + (0.1 * time.time() % 1)
-                await asyncio.sleep(wait_time)
-            else:
-                logger.error(f'Server error from Gemini API: {e}')
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (2**attempt))
 
-        except ClientError as e:
-            logger.error(f'Client error from Gemini API: {e}')
-            # Don't retry on client errors
-            raise
+def _backoff_delay(initial_retry_delay: float, attempt: int) -> float:
+    """Exponential backoff with full jitter, so concurrent callers spread their retries out."""
+    return random.uniform(0, initial_retry_delay * (2**attempt))
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a Gemini call without contacting the API."""
+
+
+class CircuitBreaker:
+    """Circuit breaker that fails fast while Gemini keeps returning server errors or timing out.
+
+    CLOSED lets every call through. After `threshold` consecutive failures the breaker turns OPEN and rejects
+    calls for `cooldown` seconds, then turns HALF_OPEN and lets a single probe through: a successful probe
+    closes the breaker, a failed one opens it again, and a probe abandoned without an outcome hands the slot
+    to the next caller. State changes never await, so they are atomic on the event loop without a lock.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold: int, cooldown: float, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Raise CircuitOpenError unless a call may be made now, returning True if the call is the half-open probe."""
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.cooldown:
+            # Let this caller through as the probe; others fail fast until it reports back
+            self.state = self.HALF_OPEN
+            return True
+        raise CircuitOpenError(f'Gemini circuit breaker is {self.state}, failing fast')
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                logger.warning(f'Opening Gemini circuit breaker after {self.failures} consecutive failures')
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def record_client_error(self, code: int) -> None:
+        """Settle a probe that Gemini answered with a client error; outside HALF_OPEN client errors are not counted."""
+        if self.state != self.HALF_OPEN:
+            return
+        # Gemini is reachable, but a rate limited probe means it is not ready for traffic yet
+        if code == 429:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def release_probe(self) -> None:
+        """Hand an unsettled probe back, so the next caller probes instead of the breaker staying HALF_OPEN."""
+        if self.state == self.HALF_OPEN:
+            # The cooldown has already elapsed, so the next allow() becomes the probe
+            self.state = self.OPEN
 
-        except Exception as e:
-            last_error = e
-            logger.error(f'Unexpected error from Gemini API: {e}')
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
 
-    logger.error(f'Failed after {max_retries} attempts. Last error: {last_error}')
-    return None
+# Circuit breakers keyed by model name
+circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    """Return the circuit breaker for a model, creating it on first use."""
+    breaker = circuit_breakers.get(model)
+    if breaker is None:
+        settings = get_settings()
+        breaker = CircuitBreaker(settings.gemini.circuit_breaker_threshold, settings.gemini.circuit_breaker_cooldown)
+        circuit_breakers[model] = breaker
+    return breaker
+
+
+async def gemini_text_to_text(
+    prompt: str,
+    system_instruction: list[str] | None = None,
+    model: str = get_settings().gemini.model,
+    temperature: float = get_settings().gemini.temperature,
+    max_output_tokens: int = get_settings().gemini.max_output_tokens,
+    max_retries: int = 3,
+    initial_retry_delay: float = 1.0,
+) -> str | None:
+    """Generate text using Gemini's text-to-text model with retry logic.
+
+    Collects the output of `gemini_text_to_text_stream`, returning None if nothing was generated.
+    """
+    from google.genai.errors import ClientError
+
+    try:
+        parts = [
+            text
+            async for text in gemini_text_to_text_stream(
+                prompt,
+                system_instruction=system_instruction,
+                model=model,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+                max_retries=max_retries,
+                initial_retry_delay=initial_retry_delay,
+            )
+        ]
+    except ClientError:
+        # Don't retry on client errors
+        raise
+    except CircuitOpenError as e:
+        # Failing fast is expected while Gemini is down, so it is not reported as a broken stream
+        logger.warning(f'Skipping Gemini call: {e}')
+        return None
+    except Exception as e:
+        logger.error(f'Gemini response stream was interrupted: {e}')
+        return None
+
+    return ''.join(parts) or None
 
 
 async def gemini_text_to_text_stream(
     prompt: str,
     system_instruction: list[str] | None = None,
-    model: str = settings.gemini.model,
-    temperature: float = settings.gemini.temperature,
-    max_output_tokens: int = settings.gemini.max_output_tokens,
+    model: str = get_settings().gemini.model,
+    temperature: float = get_settings().gemini.temperature,
+    max_output_tokens: int = get_settings().gemini.max_output_tokens,
     max_retries: int = 3,
     initial_retry_delay: float = 1.0,
 ) -> AsyncGenerator[str, None]:
     """Generate text using Gemini's text-to-text model with streaming support."""
-    contents = [types.Content(role='user', parts=[types.Part.from_text(text=prompt)])]
+    from google.genai.errors import ClientError, ServerError
 
-    generate_content_config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
-        temperature=temperature,
-        max_output_tokens=max_output_tokens,
-        response_mime_type='text/plain',
+    # Plain dicts are accepted by the SDK and avoid building pydantic content models per request
+    contents: list[types.ContentDict] = [{'role': 'user', 'parts': [{'text': prompt}]}]
+
+    generate_content_config = _generate_content_config(
+        tuple(system_instruction) if system_instruction is not None else None, temperature, max_output_tokens
     )
 
-    retry_delay = initial_retry_delay
     last_error = None
+    has_yielded = False
+    breaker = get_circuit_breaker(model)
 
     for attempt in range(max_retries):
+        is_probe = False
         try:
-            # Check rate limit before making request
+            # Fail fast while Gemini is known to be down, then check rate limit before making request
+            is_probe = breaker.allow()
             await check_rate_limit()
 
             logger.debug(f'Attempting Gemini streaming API call (attempt {attempt + 1}/{max_retries})')
 
             # Each chunk is a GenerateContentResponse object
-            # generate_content_stream returns AsyncIterator[GenerateContentResponse]
-            async for chunk in gemini_client.aio.models.generate_content_stream(  # type: ignore[attr-defined]
+            # generate_content_stream is a coroutine resolving to AsyncIterator[GenerateContentResponse]
+            async for chunk in await get_gemini_client().aio.models.generate_content_stream(  # type: ignore[attr-defined]
                 model=model,
                 contents=contents,
                 config=generate_content_config,
             ):
                 # chunk.text is Optional[str] - only yield if it has content
                 if chunk.text:  # type: ignore[attr-defined]
+                    has_yielded = True
                     yield chunk.text  # type: ignore[misc]
 
+            breaker.record_success()
+            retry_budget.deposit()
             logger.debug('Gemini streaming API call completed')
             return
 
+        except CircuitOpenError:
+            raise
+
         except ServerError as e:
+            breaker.record_failure()
+            if has_yielded:
+                # Retrying would repeat the text already sent to the caller
+                raise
             last_error = e
             # Check if this is a rate limit error (usually 429 status code)
             if 'rate' in str(e).lower() or '429' in str(e):
                 logger.warning(f'Rate limit error from Gemini API: {e}')
-                wait_time = retry_delay * (2**attempt) + (0.1 * time.time() % 1)
-                await asyncio.sleep(wait_time)
             else:
                 logger.error(f'Server error from Gemini API: {e}')
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (2**attempt))
 
         except ClientError as e:
+            breaker.record_client_error(e.code)
             logger.error(f'Client error from Gemini API: {e}')
             raise
 
         except Exception as e:
+            if isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)):
+                breaker.record_failure()
+            if has_yielded:
+                raise
             last_error = e
             logger.error(f'Unexpected error from Gemini API: {e}')
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
+
+        finally:
+            # A probe that ended without an outcome (cancelled, closed early, or an error that says nothing about
+            # Gemini's health) must not leave the breaker HALF_OPEN, where it would reject every call
+            if is_probe:
+                breaker.release_probe()
+
+        if attempt < max_retries - 1:
+            if not retry_budget.consume():
+                logger.warning('Gemini retry budget exhausted, not retrying')
+                break
+            await asyncio.sleep(_backoff_delay(initial_retry_delay, attempt))
 
     logger.error(f'Streaming failed after {max_retries} attempts. Last error: {last_error}')
@@ -2,20 +2,41 @@
 
 import asyncio
 import hashlib
-import json
-from collections.abc import Coroutine
-from typing import Any
+from collections.abc import Callable, Sequence
+from itertools import accumulate
 
 from cachetools import TTLCache
 
 from gemini_claude_code_mcp.config.settings import settings
 from gemini_claude_code_mcp.models.context import AnalysisRequest, AnalysisResult, ChunkingStrategy
 from gemini_claude_code_mcp.services.gemini import gemini_text_to_text
-from gemini_claude_code_mcp.utils.chunking import count_tokens, smart_chunk_content
+from gemini_claude_code_mcp.services.result_cache import DiskResultCache
+from gemini_claude_code_mcp.utils.chunking import count_tokens, count_tokens_serial, smart_chunk_content
 from gemini_claude_code_mcp.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Number of partial findings combined by each intermediate merge request
+_MERGE_FAN_IN = 4
+
+# Responses standing in for an analysis that Gemini did not produce
+_NO_CONTENT = 'No content to analyze'
+_NO_RESPONSE = 'No response from Gemini'
+
+
+def _retrieve_exception(future: asyncio.Future[str | None]) -> None:
+    """Mark a shared request's exception as retrieved, so asyncio does not warn about it when no waiter is left."""
+    if not future.cancelled():
+        future.exception()
+
+
+def _format_findings(findings: Sequence[tuple[list[int], str]]) -> str:
+    """Format (part numbers, findings text) pairs for a prompt, labelling each with the parts it covers."""
+    return '\n\n'.join(
+        f'Part {parts[0]}: {text}' if len(parts) == 1 else f'Parts {", ".join(map(str, parts))}: {text}'
+        for parts, text in findings
+    )
+
 
 class LargeContextAnalyzer:
     """Service for analyzing large contexts using Gemini's extended context window."""
@@ -24,12 +45,15 @@ class LargeContextAnalyzer:
         self.cache: TTLCache[str, AnalysisResult] = TTLCache(
             maxsize=settings.cache_max_size, ttl=settings.cache_ttl_seconds
         )
+        # Second cache tier on disk, so results survive restarts
+        self.disk_cache = DiskResultCache(settings.cache) if settings.cache.enabled else None
         self.claude_limit = settings.context_limits.claude_max_tokens
         self.gemini_limit = settings.context_limits.gemini_max_tokens
 
-    def needs_large_context_processing(self, content: str) -> bool:
+    def needs_large_context_processing(self, content: str, token_count: int | None = None) -> bool:
         """Check if content exceeds Claude's context limit."""
-        token_count = count_tokens(content)
+        if token_count is None:
+            token_count = count_tokens(content)
         logger.debug(f'Content has {token_count} tokens (Claude limit: {self.claude_limit})')
         return token_count > self.claude_limit
 
@@ -38,13 +62,13 @@ class LargeContextAnalyzer:
         cache_key = self._generate_cache_key(request)
 
         # Check cache first
-        if cache_key in self.cache:
-            logger.info('Returning cached analysis result')
-            return self.cache[cache_key]
+        cached = await self._get_cached(cache_key, request.content)
+        if cached is not None:
+            return cached
 
-        total_tokens = count_tokens(request.content)
+        total_tokens = request.total_tokens if request.total_tokens is not None else count_tokens(request.content)
 
-        if not self.needs_large_context_processing(request.content):
+        if not self.needs_large_context_processing(request.content, total_tokens):
             # Content fits in Claude's context, no need for Gemini
             logger.info(f"Content fits in Claude's context ({total_tokens} tokens)")
             result = AnalysisResult(
@@ -55,25 +79,15 @@ class LargeContextAnalyzer:
                 used_gemini=False,
                 response=None,
             )
-            self.cache[cache_key] = result
+            await self._set_cached(cache_key, result)
             return result
 
         # Process with Gemini
         logger.info(f'Processing large context ({total_tokens} tokens) with Gemini')
 
-        # Use appropriate chunking strategy
-        if request.chunking_strategy == ChunkingStrategy.CODE_AWARE:
-            # Use existing chunking utility
-            filename = request.context_metadata.get('filename', 'content.txt')
-            chunks = smart_chunk_content(
-                request.content,
-                filename,
-                chunk_size=self.gemini_limit - 1000,  # Leave room for prompts
-            )
-        else:
-            # For simple chunking, just split by size
-            chunks = self._simple_chunk_by_size(request.content)
-        response = await self._process_chunks_with_gemini(chunks, request.query)
+        filename = request.context_metadata.get('filename', 'content.txt')
+        chunks = self._chunk_content(request.content, request.chunking_strategy, filename)
+        response, complete = await self._process_chunks_with_gemini(chunks, request.query)
 
         result = AnalysisResult(
             query=request.query,
@@ -84,9 +98,149 @@ class LargeContextAnalyzer:
             response=response,
         )
 
-        self.cache[cache_key] = result
+        await self._set_cached(cache_key, result, persist=complete)
         return result
 
+    async def analyze_sections(
+        self,
+        query: str,
+        sections: Sequence[tuple[str, int]],
+        chunking_strategy: ChunkingStrategy = ChunkingStrategy.CODE_AWARE,
+        filenames: Sequence[str] | None = None,
+    ) -> AnalysisResult:
+        """Analyze content given as ordered (text, token_count) sections without joining it into one string.
+
+        Section token counts must be exact and every section must start on a tokenizer boundary, so that the
+        counts add up to the token count of the joined content. Chunks are packed from whole sections and each is
+        only built when its Gemini request is about to be sent, so at most `max_concurrency` chunks are held in
+        memory at once. A section larger than a chunk is split on its own with the given chunking strategy, using
+        its name from `filenames` (one per section) to find code boundaries.
+
+        The result's `content` is only filled in when the content fits in Claude's context.
+        """
+        hasher = hashlib.sha256()
+        total_tokens = 0
+        for text, token_count in sections:
+            hasher.update(text.encode())
+            total_tokens += token_count
+
+        # Hashing the sections incrementally gives the same key as analyze() would for the joined content
+        cache_key = self._build_cache_key(query, hasher.hexdigest(), chunking_strategy)
+        cached = await self._get_cached(cache_key, '')
+        if cached is not None:
+            return cached
+
+        if total_tokens <= self.claude_limit:
+            logger.info(f"Content fits in Claude's context ({total_tokens} tokens)")
+            result = AnalysisResult(
+                query=query,
+                content=''.join(text for text, _ in sections),
+                total_tokens=total_tokens,
+                chunks_processed=0,
+                used_gemini=False,
+                response=None,
+            )
+            await self._set_cached(cache_key, result)
+            return result
+
+        logger.info(f'Processing large context ({total_tokens} tokens) with Gemini')
+
+        chunk_limit = self.gemini_limit - 1000  # Leave room for prompts
+        # Line number at which each section starts, plus the end of the last one
+        line_offsets = list(accumulate((text.count('\n') for text, _ in sections), initial=0))
+
+        # Plan chunks as ranges of sections, or as ready-made pieces of a section too large for one chunk
+        plan: list[range | tuple[str, int, int]] = []
+        start = 0
+        current_tokens = 0
+        for i, (text, token_count) in enumerate(sections):
+            if current_tokens + token_count > chunk_limit and i > start:
+                plan.append(range(start, i))
+                start = i
+                current_tokens = 0
+            if token_count > chunk_limit:
+                offset = line_offsets[i]
+                filename = filenames[i] if filenames is not None else 'content.txt'
+                plan.extend(
+                    (chunk_text, offset + start_line, offset + end_line)
+                    for chunk_text, start_line, end_line in self._chunk_content(text, chunking_strategy, filename)
+                )
+                start = i + 1
+                continue
+            current_tokens += token_count
+        if start < len(sections):
+            plan.append(range(start, len(sections)))
+
+        def build_chunk(index: int) -> tuple[str, int, int]:
+            spec = plan[index]
+            if isinstance(spec, tuple):
+                return spec
+            # The last line of the range is the one before the next section starts, unless the range ends mid-line
+            end_line = line_offsets[spec.stop] - (1 if sections[spec.stop - 1][0].endswith('\n') else 0)
+            return ''.join(sections[i][0] for i in spec), line_offsets[spec.start], end_line
+
+        response, complete = await self._process_lazy_chunks_with_gemini(len(plan), build_chunk, query)
+
+        result = AnalysisResult(
+            query=query,
+            content='',
+            total_tokens=total_tokens,
+            chunks_processed=len(plan),
+            used_gemini=True,
+            response=response,
+        )
+
+        await self._set_cached(cache_key, result, persist=complete)
+        return result
+
+    def _chunk_content(
+        self, content: str, chunking_strategy: ChunkingStrategy, filename: str = 'content.txt'
+    ) -> list[tuple[str, int, int]]:
+        """Split content into Gemini-sized chunks using the requested strategy."""
+        if chunking_strategy == ChunkingStrategy.CODE_AWARE:
+            # Use existing chunking utility
+            return smart_chunk_content(
+                content,
+                filename,
+                chunk_size=self.gemini_limit - 1000,  # Leave room for prompts
+            )
+        # For simple chunking, just split by size
+        return self._simple_chunk_by_size(content)
+
+    async def _get_cached(self, cache_key: str, content: str) -> AnalysisResult | None:
+        """Look a result up in memory, then on disk, promoting disk hits into memory.
+
+        Disk entries are stored without their content, so a disk hit gets the given content of the request back.
+        """
+        result = self.cache.get(cache_key)
+        if result is None and self.disk_cache is not None:
+            serialized = await asyncio.to_thread(self.disk_cache.get, cache_key)
+            if serialized is not None:
+                result = AnalysisResult.model_validate_json(serialized)
+                result.content = content
+                self.cache[cache_key] = result
+        if result is not None:
+            logger.info('Returning cached analysis result')
+        return result
+
+    async def _set_cached(self, cache_key: str, result: AnalysisResult, persist: bool = True) -> None:
+        """Store a result in memory, and on disk if it holds a complete response from Gemini.
+
+        Results that did not need Gemini are cheap to recompute, and a failed analysis must be retried rather than
+        served from disk after a restart. Pass `persist=False` for an analysis synthesized without some of its
+        chunks, so it is not served for the whole TTL. The analyzed content is left out of the disk entry, so
+        source code is never written to the cache directory.
+        """
+        self.cache[cache_key] = result
+        if (
+            persist
+            and self.disk_cache is not None
+            and result.used_gemini
+            and result.response not in (_NO_CONTENT, _NO_RESPONSE)
+        ):
+            serialized = result.model_copy(update={'content': ''}).model_dump_json()
+            await asyncio.to_thread(self.disk_cache.set, cache_key, serialized)
+
     def _simple_chunk_by_size(self, content: str) -> list[tuple[str, int, int]]:
         """Simple chunking by token count, returns format compatible with smart_chunk_content."""
         chunks: list[tuple[str, int, int]] = []
@@ -95,10 +249,10 @@ class LargeContextAnalyzer:
         current_tokens = 0
         chunk_limit = self.gemini_limit - 1000  # Leave room for prompts
         start_line = 0
+        # Tokenize every line up front rather than once per loop iteration
+        line_token_counts = count_tokens_serial(line + '\n' for line in lines)
 
-        for i, line in enumerate(lines):
-            line_tokens = count_tokens(line + '\n')
-
+        for i, (line, line_tokens) in enumerate(zip(lines, line_token_counts, strict=True)):
             if current_tokens + line_tokens > chunk_limit and current_chunk:
                 chunk_text = '\n'.join(current_chunk)
                 chunks.append((chunk_text, start_line, i - 1))
@@ -119,14 +273,27 @@ class LargeContextAnalyzer:
         self,
         chunks: list[tuple[str, int, int]],  # (chunk_text, start_line, end_line)
         query: str,
-    ) -> str:
-        """Process chunks through Gemini and aggregate responses."""
-        if not chunks:
-            return 'No content to analyze'
+    ) -> tuple[str, bool]:
+        """Process chunks through Gemini and aggregate responses, returning (response, all chunks succeeded)."""
+        return await self._process_lazy_chunks_with_gemini(len(chunks), chunks.__getitem__, query)
+
+    async def _process_lazy_chunks_with_gemini(
+        self,
+        chunk_count: int,
+        build_chunk: Callable[[int], tuple[str, int, int]],  # index -> (chunk_text, start_line, end_line)
+        query: str,
+    ) -> tuple[str, bool]:
+        """Process chunks through Gemini, building each one only when its request is about to be sent.
+
+        Returns the response and whether every chunk got a response. A failed chunk is left out of the synthesis,
+        so the response is then only a partial analysis.
+        """
+        if not chunk_count:
+            return _NO_CONTENT, True
 
         # For single chunk, process directly
-        if len(chunks) == 1:
-            chunk_text, start_line, end_line = chunks[0]
+        if chunk_count == 1:
+            chunk_text, _, _ = build_chunk(0)
             prompt = (
                 f'Analyze the following code/content and answer this query: {query}\n\n'
                 f'Content:\n{chunk_text}\n\n'
@@ -134,45 +301,100 @@ class LargeContextAnalyzer:
             )
 
             result = await gemini_text_to_text(prompt)
-            return result or 'No response from Gemini'
-
-        # For multiple chunks, process in parallel with context
-        chunk_responses: list[str | None] = []
-        tasks: list[Coroutine[Any, Any, str | None]] = []
-
-        for i, (chunk_text, start_line, end_line) in enumerate(chunks):
-            prompt = (
-                f'You are analyzing part {i + 1} of {len(chunks)} of a larger codebase.\n'
-                f'Query: {query}\n\n'
-                f'Content (lines {start_line}-{end_line}):\n'
-                f'{chunk_text}\n\n'
-                f'Analyze this section and provide findings relevant to the query.\n'
-                f'Note any references to other parts that might be in other chunks.'
-            )
-
-            tasks.append(gemini_text_to_text(prompt))
-
-        chunk_responses = await asyncio.gather(*tasks)
-
-        # Aggregate responses
-        findings = '\n\n'.join([f'Part {i + 1}: {resp}' for i, resp in enumerate(chunk_responses) if resp])
+            return result or _NO_RESPONSE, bool(result)
+
+        # For multiple chunks, process in parallel with context, capping in-flight requests so a large codebase
+        # does not burst past the rate limit and fall into the retry backoff
+        semaphore = asyncio.Semaphore(settings.gemini.max_concurrency)
+
+        # One request per distinct chunk text; duplicated files (vendored or generated code) share its response
+        requests_by_digest: dict[bytes, asyncio.Future[str | None]] = {}
+
+        async def _run(i: int) -> str | None:
+            async with semaphore:
+                chunk_text, start_line, end_line = build_chunk(i)
+                digest = hashlib.blake2b(chunk_text.encode(), digest_size=16).digest()
+                request = requests_by_digest.get(digest)
+                if request is None:
+                    prompt = (
+                        f'You are analyzing part {i + 1} of {chunk_count} of a larger codebase.\n'
+                        f'Query: {query}\n\n'
+                        f'Content (lines {start_line}-{end_line}):\n'
+                        f'{chunk_text}\n\n'
+                        f'Analyze this section and provide findings relevant to the query.\n'
+                        f'Note any references to other parts that might be in other chunks.'
+                    )
+                    request = requests_by_digest[digest] = asyncio.ensure_future(gemini_text_to_text(prompt))
+                    request.add_done_callback(_retrieve_exception)
+                    return await request
+            # Wait for the identical chunk's request without holding a concurrency slot
+            return await request
+
+        async def _merge(merge_prompt: str) -> str | None:
+            # Merges share the chunk requests' concurrency cap, so they cannot push past it while chunks are in flight
+            async with semaphore:
+                return await gemini_text_to_text(merge_prompt)
+
+        # Merge findings in groups as they arrive instead of waiting for every chunk, so synthesis overlaps with the
+        # chunks still in flight and no single prompt has to hold every part's findings
+        findings: list[tuple[list[int], str]] = []  # (part numbers, findings text)
+        complete = True
+        pending: dict[asyncio.Future[str | None], list[tuple[list[int], str]]] = {
+            asyncio.ensure_future(_run(i)): [([i + 1], '')] for i in range(chunk_count)
+        }
+        merging = True
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    inputs = pending.pop(task)
+                    response = task.result()
+                    if response:
+                        findings.append((sorted(part for parts, _ in inputs for part in parts), response))
+                    elif len(inputs) > 1:
+                        # A failed merge keeps its inputs for the final synthesis and stops further merging
+                        findings.extend(inputs)
+                        merging = False
+                    else:
+                        complete = False
+                while merging and len(findings) >= _MERGE_FAN_IN and (pending or len(findings) > _MERGE_FAN_IN):
+                    findings.sort()
+                    group = findings[:_MERGE_FAN_IN]
+                    del findings[:_MERGE_FAN_IN]
+                    merge_prompt = (
+                        f'You are analyzing a large codebase in {chunk_count} parts for this query: {query}\n\n'
+                        f'Here are the findings from some of the parts:\n\n'
+                        f'{_format_findings(group)}\n\n'
+                        f'Combine these findings into one set of findings relevant to the query. Keep the details and '
+                        f'any references to other parts, which will be resolved when all findings are synthesized.'
+                    )
+                    pending[asyncio.ensure_future(_merge(merge_prompt))] = group
+        finally:
+            for task in pending:
+                task.cancel()
 
         aggregation_prompt = (
-            f'You analyzed a large codebase in {len(chunks)} parts for this query: {query}\n\n'
+            f'You analyzed a large codebase in {chunk_count} parts for this query: {query}\n\n'
             f'Here are the findings from each part:\n\n'
-            f'{findings}\n\n'
+            f'{_format_findings(sorted(findings))}\n\n'
             f'Synthesize these findings into a comprehensive answer. '
             f'Resolve any cross-references between parts and provide a cohesive response.'
         )
 
         final_result = await gemini_text_to_text(aggregation_prompt)
-        return final_result or 'No response from Gemini'
+        return final_result or _NO_RESPONSE, complete
 
     def _generate_cache_key(self, request: AnalysisRequest) -> str:
         """Generate a cache key for the request."""
-        key_data = {
-            'query': request.query,
-            'content_hash': hashlib.sha256(request.content.encode()).hexdigest(),
-            'strategy': request.chunking_strategy.value,
-        }
-        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+        return self._build_cache_key(request.query, request.content_hash, request.chunking_strategy)
+
+    @staticmethod
+    def _build_cache_key(query: str, content_hash: str, chunking_strategy: ChunkingStrategy) -> str:
+        """Build a cache key from the query, the content's SHA-256 hex digest and the chunking strategy."""
+        # Fields are fed straight into the digest, NUL-separated so adjacent fields cannot run together
+        digest = hashlib.sha256(query.encode())
+        digest.update(b'\x00')
+        digest.update(content_hash.encode())
+        digest.update(b'\x00')
+        digest.update(chunking_strategy.value.encode())
+        return digest.hexdigest()
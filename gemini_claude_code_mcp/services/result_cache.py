@@ -0,0 +1,104 @@
+"""Disk-persistent cache for analysis results, so they survive server restarts."""
+
+import sqlite3
+import time
+from collections.abc import Callable
+
+from gemini_claude_code_mcp.config.settings import CacheSettings
+from gemini_claude_code_mcp.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Column ordering rows for eviction under each policy, least valuable first
+_EVICTION_ORDER = {
+    'lru': 'accessed',
+    'lfu': 'hits',
+    'fifo': 'created',
+}
+
+
+class DiskResultCache:
+    """SQLite-backed key/value cache with a time-to-live and a total size bound.
+
+    Values are strings (serialized results). Every method opens its own connection, so the cache can be used from
+    worker threads via `asyncio.to_thread`. Database errors are logged and treated as cache misses. Entry times
+    come from `clock`, wall-clock time by default, since they are compared across restarts.
+    """
+
+    def __init__(self, cache_settings: CacheSettings, clock: Callable[[], float] = time.time):
+        self.path = cache_settings.directory / 'analysis_results.sqlite3'
+        self.ttl = cache_settings.ttl
+        self.max_size_bytes = int(cache_settings.max_size_gb * 1024**3)
+        self.eviction_order = _EVICTION_ORDER[cache_settings.eviction_policy]
+        self.clock = clock
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with connection:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                    'created REAL NOT NULL, accessed REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)'
+                )
+            self._initialized = True
+        return connection
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for a key, or None if it is missing or expired."""
+        now = self.clock()
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    row = connection.execute('SELECT value, created FROM results WHERE key = ?', (key,)).fetchone()
+                    if row is None:
+                        return None
+                    value, created = row
+                    if now - created > self.ttl:
+                        connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                        return None
+                    connection.execute('UPDATE results SET accessed = ?, hits = hits + 1 WHERE key = ?', (now, key))
+                    return value
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f'Disk cache read failed: {e}')
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value, dropping expired entries and evicting others while the cache is over its size bound."""
+        now = self.clock()
+        size = len(value.encode())
+        if size > self.max_size_bytes:
+            return
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO results (key, value, size, created, accessed, hits) '
+                        'VALUES (?, ?, ?, ?, ?, 0)',
+                        (key, value, size, now, now),
+                    )
+                    connection.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+                    (total,) = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+                    if total > self.max_size_bytes:
+                        rows = connection.execute(
+                            f'SELECT key, size FROM results WHERE key != ? ORDER BY {self.eviction_order}', (key,)
+                        ).fetchall()
+                        evicted: list[tuple[str]] = []
+                        for old_key, old_size in rows:
+                            if total <= self.max_size_bytes:
+                                break
+                            evicted.append((old_key,))
+                            total -= old_size
+                        connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f'Disk cache write failed: {e}')
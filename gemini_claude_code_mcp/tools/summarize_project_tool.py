@@ -1,18 +1,40 @@
 """Project summarization tool for analyzing codebases."""
 
+import asyncio
+import os
+import re
+from collections import Counter
 from pathlib import Path
 from typing import Any
 
 from fastmcp import FastMCP
 
-from gemini_claude_code_mcp.models.context import AnalysisRequest, ChunkingStrategy, FilePattern
+from gemini_claude_code_mcp.config.settings import get_settings
+from gemini_claude_code_mcp.models.context import ChunkingStrategy, FilePattern
 from gemini_claude_code_mcp.services.file_collector import FileCollector
 from gemini_claude_code_mcp.services.large_context_analyzer import LargeContextAnalyzer
-from gemini_claude_code_mcp.utils.chunking import count_tokens
+from gemini_claude_code_mcp.utils.chunking import count_tokens_batch
 from gemini_claude_code_mcp.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Section headers in the analysis response, optionally numbered, e.g. '**Overview**' or '1. **Overview**'
+_SECTION_KEYS = {
+    'Overview': 'overview',
+    'Technology Stack': 'tech_stack',
+    'Architecture': 'architecture',
+    'Main Components': 'components',
+    'Key Features': 'key_features',
+    'Dependencies': 'dependencies',
+    'Code Quality': 'code_quality',
+}
+_SECTION_HEADER_RE = re.compile(rf'(?:\d+\.\s+)?\*\*({"|".join(_SECTION_KEYS)})\*\*')
+
+# Shared across calls so the analyzer's result cache survives between tool invocations. Both are only used
+# from the event loop thread, so the cache needs no locking.
+_file_collector = FileCollector()
+_analyzer = LargeContextAnalyzer()
+
 
 def register_summarize_project_tool(mcp: FastMCP[Any]):
     """Register the summarize_project tool with the MCP server."""
@@ -65,10 +87,6 @@ def register_summarize_project_tool(mcp: FastMCP[Any]):
 
             logger.info(f'Starting project summary for: {project_path}')
 
-            # Initialize services
-            file_collector = FileCollector()
-            analyzer = LargeContextAnalyzer()
-
             # Prepare file pattern
             file_pattern = FilePattern(
                 include=include_patterns or [],
@@ -78,7 +96,7 @@ def register_summarize_project_tool(mcp: FastMCP[Any]):
 
             # Collect files
             logger.info('Collecting project files...')
-            collected_files = await file_collector.collect_files(str(project_path), file_pattern)
+            collected_files = await _file_collector.collect_files(str(project_path), file_pattern)
 
             if not collected_files:
                 return {
@@ -88,8 +106,21 @@ def register_summarize_project_tool(mcp: FastMCP[Any]):
 
             logger.info(f'Collected {len(collected_files)} files')
 
-            # Generate project structure
-            structure = _generate_project_structure(project_path, collected_files)
+            # Leave out single files (minified bundles, lock files, data dumps) big enough to dominate the analysis,
+            # before they are tokenized, so the limit applies to the four-characters-per-token estimate
+            max_file_tokens = get_settings().processing.max_file_tokens
+            skipped_large_files = [f.relative_path for f in collected_files if f.token_count > max_file_tokens]
+            if skipped_large_files:
+                logger.info(f'Skipping {len(skipped_large_files)} files above {max_file_tokens} estimated tokens')
+                collected_files = [f for f in collected_files if f.token_count <= max_file_tokens]
+                if not collected_files:
+                    return {
+                        'error': 'All matching files exceed the per-file token limit',
+                        'status': 'failed',
+                    }
+
+            # Collection only estimates token counts; the summary reports exact ones
+            await _file_collector.count_precise_tokens(collected_files)
 
             # Prepare analysis query
             focus_context = ''
@@ -107,29 +138,32 @@ def register_summarize_project_tool(mcp: FastMCP[Any]):
             {focus_context}
             Provide a structured, detailed summary that would help a developer quickly understand this codebase."""
 
-            # Combine file contents for analysis
-            combined_content = _combine_file_contents(collected_files, project_path)
-            total_tokens = count_tokens(combined_content)
+            # Split the combined file contents into per-file sections rather than one large string
+            sections = _project_sections(collected_files, project_path)
+            section_tokens = await asyncio.to_thread(count_tokens_batch, sections)
+            total_tokens = sum(section_tokens)
 
             logger.info(f'Total content tokens: {total_tokens}')
 
-            # Create analysis request
-            analysis_request = AnalysisRequest(
-                query=analysis_query,
-                content=combined_content,
-                chunking_strategy=ChunkingStrategy.CODE_AWARE,
-                context_metadata={
-                    'project_path': str(project_path),
-                    'file_count': len(collected_files),
-                },
-            )
-
-            # Analyze with LargeContextAnalyzer
+            # Analyze with LargeContextAnalyzer, building the project structure and statistics in worker threads
+            # while the analysis waits on Gemini
             logger.info('Analyzing project content...')
-            analysis_result = await analyzer.analyze(analysis_request)
-
-            # Generate statistics
-            statistics = _generate_statistics(collected_files)
+            analysis_task = asyncio.create_task(
+                _analyzer.analyze_sections(
+                    analysis_query,
+                    list(zip(sections, section_tokens, strict=True)),
+                    ChunkingStrategy.CODE_AWARE,
+                    # The overview section comes first, followed by one section per file
+                    filenames=['overview.md', *(file.relative_path for file in collected_files)],
+                )
+            )
+            analysis_result, structure, statistics = await asyncio.gather(
+                analysis_task,
+                asyncio.to_thread(_generate_project_structure, project_path, collected_files),
+                asyncio.to_thread(_generate_statistics, collected_files),
+            )
+            if skipped_large_files:
+                statistics['skipped_large_files'] = skipped_large_files
 
             # Parse the analysis response into structured sections
             structured_summary = _parse_analysis_response(analysis_result.response or 'No analysis available')
@@ -139,12 +173,12 @@ def register_summarize_project_tool(mcp: FastMCP[Any]):
                 'project_path': str(project_path),
                 'overview': structured_summary.get('overview', 'No overview available'),
                 'structure': structure,
-                'tech_stack': structured_summary.get('tech_stack', {}),
-                'architecture': structured_summary.get('architecture', {}),
+                'tech_stack': structured_summary.get('tech_stack', ''),
+                'architecture': structured_summary.get('architecture', ''),
                 'components': structured_summary.get('components', []),
                 'key_features': structured_summary.get('key_features', []),
                 'dependencies': structured_summary.get('dependencies', []),
-                'code_quality': structured_summary.get('code_quality', {}),
+                'code_quality': structured_summary.get('code_quality', ''),
                 'statistics': statistics,
                 'analysis_details': {
                     'files_analyzed': len(collected_files),
@@ -166,18 +200,20 @@ def _generate_project_structure(project_path: Path, collected_files: list[Any])
     """Generate a hierarchical representation of the project structure."""
     structure: dict[str, Any] = {'name': project_path.name, 'type': 'directory', 'children': {}}
 
+    # Children dict of each directory seen so far, so files sharing a directory skip the walk from the root
+    directories: dict[str, dict[str, Any]] = {'': structure['children']}
+
     for file in collected_files:
-        relative_path = Path(file.relative_path)
-        parts = relative_path.parts
+        directory, filename = os.path.split(file.relative_path)
 
-        current: dict[str, Any] = structure['children']
-        for part in parts[:-1]:
-            if part not in current:
-                current[part] = {'type': 'directory', 'children': {}}
-            current = current[part]['children']
+        current = directories.get(directory)
+        if current is None:
+            current = structure['children']
+            for part in Path(directory).parts:
+                current = current.setdefault(part, {'type': 'directory', 'children': {}})['children']
+            directories[directory] = current
 
         # Add the file
-        filename = parts[-1]
         current[filename] = {
             'type': 'file',
             'language': file.language,
@@ -188,55 +224,49 @@ def _generate_project_structure(project_path: Path, collected_files: list[Any])
     return structure
 
 
-def _combine_file_contents(collected_files: list[Any], project_path: Path) -> str:
-    """Combine file contents with metadata headers."""
-    combined_parts: list[str] = []
+def _project_sections(collected_files: list[Any], project_path: Path) -> list[str]:
+    """Build the combined file contents with metadata headers as a list of sections, one per file.
 
-    # Add project overview
-    combined_parts.append(f'# Project: {project_path.name}')
-    combined_parts.append(f'# Path: {project_path}')
-    combined_parts.append(f'# Total Files: {len(collected_files)}')
-    combined_parts.append('\n---\n')
+    Every section after the first starts with a file header right after a newline, which the tokenizer never
+    merges across, so the section token counts add up to the token count of the joined text.
+    """
+    # Project overview
+    sections = [
+        f'# Project: {project_path.name}\n# Path: {project_path}\n# Total Files: {len(collected_files)}\n\n---\n'
+    ]
 
-    # Add each file with header
+    # Each file with header; the blank lines separating files end the previous section
     for file in collected_files:
-        header = f'\n### File: {file.relative_path}\n'
-        header += f'Language: {file.language or "unknown"}\n'
-        header += f'Size: {file.size} bytes | Tokens: {file.token_count}\n'
-        header += '```\n'
+        sections[-1] += '\n\n'
+        sections.append(
+            f'### File: {file.relative_path}\n'
+            f'Language: {file.language or "unknown"}\n'
+            f'Size: {file.size} bytes | Tokens: {file.token_count}\n'
+            f'```\n\n{file.content}\n\n```\n'
+        )
 
-        combined_parts.append(header)
-        combined_parts.append(file.content)
-        combined_parts.append('\n```\n')
-
-    return '\n'.join(combined_parts)
+    return sections
 
 
 def _generate_statistics(collected_files: list[Any]) -> dict[str, Any]:
     """Generate project statistics."""
-    stats: dict[str, Any] = {
-        'total_files': len(collected_files),
-        'total_size_bytes': sum(f.size for f in collected_files),
-        'total_tokens': sum(f.token_count for f in collected_files),
-        'languages': {},
-        'file_types': {},
-    }
-
-    # Count by language
+    total_size = 0
+    total_tokens = 0
     for file in collected_files:
-        lang = file.language or 'unknown'
-        if lang not in stats['languages']:
-            stats['languages'][lang] = 0
-        stats['languages'][lang] += 1
+        total_size += file.size
+        total_tokens += file.token_count
 
-        # Count by extension
-        ext = Path(file.relative_path).suffix or 'no_extension'
-        if ext not in stats['file_types']:
-            stats['file_types'][ext] = 0
-        stats['file_types'][ext] += 1
+    # Count by language, sorted by count, and by extension
+    languages = Counter(file.language or 'unknown' for file in collected_files)
+    file_types = Counter(os.path.splitext(file.relative_path)[1] or 'no_extension' for file in collected_files)
 
-    # Sort languages by count
-    stats['languages'] = dict(sorted(stats['languages'].items(), key=lambda x: x[1], reverse=True))
+    stats: dict[str, Any] = {
+        'total_files': len(collected_files),
+        'total_size_bytes': total_size,
+        'total_tokens': total_tokens,
+        'languages': dict(languages.most_common()),
+        'file_types': dict(file_types),
+    }
 
     # Add human-readable size
     size_mb = stats['total_size_bytes'] / (1024 * 1024)
@@ -252,50 +282,39 @@ def _parse_analysis_response(response: str) -> dict[str, Any]:
 
     sections: dict[str, Any] = {
         'overview': '',
-        'tech_stack': {},
-        'architecture': {},
+        'tech_stack': '',
+        'architecture': '',
         'components': [],
         'key_features': [],
         'dependencies': [],
-        'code_quality': {},
+        'code_quality': '',
     }
 
     current_section: str | None = None
     current_content: list[str] = []
 
-    lines = response.split('\n')
+    def flush() -> None:
+        if current_section is None:
+            return
+        # List sections keep one entry per line, the others get the text
+        if isinstance(sections[current_section], list):
+            sections[current_section] = current_content
+        else:
+            sections[current_section] = '\n'.join(current_content).strip()
 
-    for line in lines:
+    for line in response.split('\n'):
         # Check for section headers
-        if line.startswith('**Overview**') or line.startswith('1. **Overview**'):
-            current_section = 'overview'
-            current_content = []
-        elif line.startswith('**Technology Stack**') or line.startswith('2. **Technology Stack**'):
-            current_section = 'tech_stack'
-            current_content = []
-        elif line.startswith('**Architecture**') or line.startswith('3. **Architecture**'):
-            current_section = 'architecture'
-            current_content = []
-        elif line.startswith('**Main Components**') or line.startswith('4. **Main Components**'):
-            current_section = 'components'
-            current_content = []
-        elif line.startswith('**Key Features**') or line.startswith('5. **Key Features**'):
-            current_section = 'key_features'
-            current_content = []
-        elif line.startswith('**Dependencies**') or line.startswith('6. **Dependencies**'):
-            current_section = 'dependencies'
-            current_content = []
-        elif line.startswith('**Code Quality**') or line.startswith('7. **Code Quality**'):
-            current_section = 'code_quality'
+        match = _SECTION_HEADER_RE.match(line)
+        if match:
+            flush()
+            current_section = _SECTION_KEYS[match.group(1)]
             current_content = []
         elif current_section:
             # Add content to current section
             if line.strip():
                 current_content.append(line.strip())
 
-    # Process collected content
-    if 'overview' in sections:
-        sections['overview'] = '\n'.join(current_content).strip()
+    flush()
 
     # For now, return the full response in overview if parsing fails
     if not any(sections.values()):
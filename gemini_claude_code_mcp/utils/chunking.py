@@ -1,6 +1,15 @@
 """Context chunking utilities for processing large codebases."""
 
+import importlib
+import io
+import os
 import re
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import accumulate, islice
+from typing import Protocol
 
 import tiktoken
 
@@ -9,96 +18,206 @@ from gemini_claude_code_mcp.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
-# Initialize tokenizer for counting tokens
-tokenizer = tiktoken.get_encoding('cl100k_base')
 
+class _Encoding(Protocol):
+    """The part of tiktoken's `Encoding` used here, which riptoken's encodings provide as well."""
 
-def count_tokens(text: str) -> int:
-    """Count the number of tokens in a text."""
-    return len(tokenizer.encode(text))
+    def encode_ordinary(self, text: str) -> list[int]: ...
+
+    def encode_ordinary_batch(self, text: list[str], *, num_threads: int = ...) -> list[list[int]]: ...
+
+
+# Initialize tokenizer for counting tokens, preferring the Rust riptoken backend (the `fast` extra) when installed.
+# It produces the same cl100k_base tokens as tiktoken, but batches with its own thread pool. Optional backends are
+# imported by name and typed through a protocol, so type checking does not depend on which extras are installed.
+tokenizer: _Encoding
+_batch_kwargs: dict[str, int]
+try:
+    tokenizer = importlib.import_module('riptoken').get_encoding('cl100k_base')
+    _batch_kwargs = {}
+except ImportError:
+    tokenizer = tiktoken.get_encoding('cl100k_base')
+    _batch_kwargs = {'num_threads': os.cpu_count() or 1}
+
+
+def count_tokens(text: str, precise: bool = True) -> int:
+    """Count the number of tokens in a text.
+
+    With `precise=False` the count is estimated as roughly four characters per token without running the
+    tokenizer, which is enough for sizing and sorting but not for packing chunks against a hard limit.
+
+    Special-token markers such as `<|endoftext|>` are counted as ordinary text, so source files that contain them do
+    not make the tokenizer raise.
+    """
+    if not precise:
+        return (len(text) + 3) >> 2
+    return len(tokenizer.encode_ordinary(text))
+
+
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    """Count the tokens of several texts with a single batched tokenizer call, encoding them on all CPU cores.
+
+    Meant for a few large texts such as whole files; for many short ones (lines, samples) the thread pool costs more
+    than it saves, so use `count_tokens_serial`. Like `count_tokens`, special-token markers are treated as ordinary
+    text.
+    """
+    return [len(tokens) for tokens in tokenizer.encode_ordinary_batch(texts, **_batch_kwargs)]
+
+
+def count_tokens_serial(texts: Iterable[str]) -> list[int]:
+    """Count the tokens of many short texts one after another on the calling thread.
+
+    Like `count_tokens`, special-token markers are treated as ordinary text.
+    """
+    encode = tokenizer.encode_ordinary
+    return [len(encode(text)) for text in texts]
+
+
+def token_upper_bound(text: str) -> int:
+    """Return a cheap upper bound on the token count of a text: its UTF-8 length, as every token covers a byte or more.
+
+    ASCII texts skip the encoding entirely, since their length in characters is already their length in bytes.
+    """
+    return len(text) if text.isascii() else len(text.encode())
+
+
+# Sampled token estimation: texts shorter than APPROX_MIN_CHARS are counted exactly, longer ones from
+# APPROX_SAMPLES evenly spaced windows of APPROX_SAMPLE_CHARS characters
+APPROX_MIN_CHARS = 9000
+APPROX_SAMPLES = 30
+APPROX_SAMPLE_CHARS = 300
+APPROX_TRIM = 3  # Samples dropped at each end of the sorted densities
+APPROX_SAFETY_FACTOR = 1.10  # Errs towards overcounting so chunks stay under their limit
+
+
+def approx_count_tokens(text: str) -> int:
+    """Estimate the token count of a long text from the token density of evenly spaced samples.
+
+    The densities (tokens per character) of the samples are sorted, trimmed at both ends and averaged, and the
+    result is scaled up by a safety factor so the estimate rarely undercounts. Short texts are counted exactly.
+    """
+    if len(text) < APPROX_MIN_CHARS:
+        return count_tokens(text)
+
+    step = (len(text) - APPROX_SAMPLE_CHARS) / (APPROX_SAMPLES - 1)
+    samples = [text[int(i * step) : int(i * step) + APPROX_SAMPLE_CHARS] for i in range(APPROX_SAMPLES)]
+    densities = sorted(
+        tokens / len(sample) for tokens, sample in zip(count_tokens_serial(samples), samples, strict=True)
+    )
+    trimmed = densities[APPROX_TRIM:-APPROX_TRIM]
+    return int(sum(trimmed) / len(trimmed) * len(text) * APPROX_SAFETY_FACTOR)
+
+
+# Language-specific patterns for finding code boundaries (functions, classes, etc.), each anchored at a line start
+CODE_BOUNDARY_PATTERNS = {
+    'python': [
+        r'^class[ \t]+\w+.*?:',
+        r'^def[ \t]+\w+.*?:',
+        r'^async[ \t]+def[ \t]+\w+.*?:',
+    ],
+    'javascript': [
+        r'^function[ \t]+\w+[ \t]*\(',
+        r'^const[ \t]+\w+[ \t]*=[ \t]*(?:async[ \t]*)?\(.*?\)[ \t]*=>',
+        r'^class[ \t]+\w+',
+        r'^export[ \t]+(?:default[ \t]+)?(?:function|class|const)',
+    ],
+    'typescript': [
+        r'^function[ \t]+\w+[ \t]*\(',
+        r'^const[ \t]+\w+[ \t]*=[ \t]*(?:async[ \t]*)?\(.*?\)[ \t]*=>',
+        r'^class[ \t]+\w+',
+        r'^export[ \t]+(?:default[ \t]+)?(?:function|class|const|interface|type)',
+        r'^interface[ \t]+\w+',
+        r'^type[ \t]+\w+',
+    ],
+    'java': [
+        r'^(?:public|private|protected)?[ \t]*class[ \t]+\w+',
+        r'^(?:public|private|protected)?[ \t]*(?:static[ \t]+)?(?:final[ \t]+)?\w+[ \t]+\w+[ \t]*\(',
+    ],
+    'cpp': [
+        r'^class[ \t]+\w+',
+        r'^struct[ \t]+\w+',
+        r'^\w+(?:[ \t]+\w+)*[ \t]+\w+[ \t]*\(',
+    ],
+}
+
+
+class _Match(Protocol):
+    """The part of a match object used for scanning."""
+
+    def start(self) -> int: ...
+
+
+class _Pattern(Protocol):
+    """The part of a compiled pattern used for scanning, shared by `re` and RE2."""
+
+    def finditer(self, string: str) -> Iterator[_Match]: ...
+
+
+# Prefer RE2 (google-re2, part of the `fast` extra) for scanning: it matches in linear time, where the backtracking
+# stdlib engine can go quadratic on the patterns above (e.g. the C++ one over many lines of words without a paren)
+_compile_boundary_pattern: Callable[[str], _Pattern]
+try:
+    _compile_boundary_pattern = importlib.import_module('re2').compile
+except ImportError:
+    _compile_boundary_pattern = re.compile
+
+# One alternation per language, compiled once, so the content is scanned in a single pass. MULTILINE is set inline,
+# as RE2 takes no flags argument. The patterns only match spaces and tabs, never newlines, so no match runs into the
+# next line and hides a boundary there.
+_COMPILED_BOUNDARY_PATTERNS = {
+    language: _compile_boundary_pattern('(?m)' + '|'.join(f'(?:{pattern})' for pattern in patterns))
+    for language, patterns in CODE_BOUNDARY_PATTERNS.items()
+}
 
 
 def find_code_boundaries(content: str, language: str) -> list[tuple[int, int]]:
-    """Find natural code boundaries (functions, classes, etc.) in the content."""
+    """Find natural code boundaries (functions, classes, etc.) in the content.
+
+    Returns (line_number, offset) tuples sorted by position. Languages without patterns use the Python ones.
+    """
     boundaries: list[tuple[int, int]] = []
+    pattern = _COMPILED_BOUNDARY_PATTERNS.get(language.lower(), _COMPILED_BOUNDARY_PATTERNS['python'])
 
-    # Language-specific patterns for finding code boundaries
-    patterns = {
-        'python': [
-            (r'^class\s+\w+.*?:', re.MULTILINE),
-            (r'^def\s+\w+.*?:', re.MULTILINE),
-            (r'^async\s+def\s+\w+.*?:', re.MULTILINE),
-        ],
-        'javascript': [
-            (r'^function\s+\w+\s*\(', re.MULTILINE),
-            (r'^const\s+\w+\s*=\s*(?:async\s*)?\(.*?\)\s*=>', re.MULTILINE),
-            (r'^class\s+\w+', re.MULTILINE),
-            (r'^export\s+(?:default\s+)?(?:function|class|const)', re.MULTILINE),
-        ],
-        'typescript': [
-            (r'^function\s+\w+\s*\(', re.MULTILINE),
-            (r'^const\s+\w+\s*=\s*(?:async\s*)?\(.*?\)\s*=>', re.MULTILINE),
-            (r'^class\s+\w+', re.MULTILINE),
-            (r'^export\s+(?:default\s+)?(?:function|class|const|interface|type)', re.MULTILINE),
-            (r'^interface\s+\w+', re.MULTILINE),
-            (r'^type\s+\w+', re.MULTILINE),
-        ],
-        'java': [
-            (r'^(?:public|private|protected)?\s*class\s+\w+', re.MULTILINE),
-            (r'^(?:public|private|protected)?\s*(?:static\s+)?(?:final\s+)?\w+\s+\w+\s*\(', re.MULTILINE),
-        ],
-        'cpp': [
-            (r'^class\s+\w+', re.MULTILINE),
-            (r'^struct\s+\w+', re.MULTILINE),
-            (r'^\w+(?:\s+\w+)*\s+\w+\s*\(', re.MULTILINE),
-        ],
-    }
-
-    # Get patterns for the language, default to common patterns
-    lang_patterns = patterns.get(language.lower(), patterns.get('python', []))
-
-    for pattern, flags in lang_patterns:
-        for match in re.finditer(pattern, content, flags):
-            line_num = content[: match.start()].count('\n')
-            boundaries.append((line_num, match.start()))
-
-    # Sort boundaries by line number
-    boundaries.sort(key=lambda x: x[0])
+    # Matches come in order, so line numbers are counted incrementally from the previous match
+    line_num = 0
+    position = 0
+    for match in pattern.finditer(content):
+        line_num += content.count('\n', position, match.start())
+        position = match.start()
+        boundaries.append((line_num, position))
 
     return boundaries
 
 
+# Programming language by (lowercased) file extension
+_EXT_TO_LANG = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.jsx': 'javascript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp',
+    '.c': 'cpp',
+    '.h': 'cpp',
+    '.hpp': 'cpp',
+    '.cs': 'csharp',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.r': 'r',
+    '.m': 'objc',
+    '.mm': 'objc',
+}
+
+
 def get_language_from_extension(filename: str) -> str:
     """Get programming language from file extension."""
-    ext_to_lang = {
-        '.py': 'python',
-        '.js': 'javascript',
-        '.ts': 'typescript',
-        '.jsx': 'javascript',
-        '.tsx': 'typescript',
-        '.java': 'java',
-        '.cpp': 'cpp',
-        '.c': 'cpp',
-        '.h': 'cpp',
-        '.hpp': 'cpp',
-        '.cs': 'csharp',
-        '.go': 'go',
-        '.rs': 'rust',
-        '.rb': 'ruby',
-        '.php': 'php',
-        '.swift': 'swift',
-        '.kt': 'kotlin',
-        '.scala': 'scala',
-        '.r': 'r',
-        '.m': 'objc',
-        '.mm': 'objc',
-    }
-
-    for ext, lang in ext_to_lang.items():
-        if filename.endswith(ext):
-            return lang
-
-    return 'text'
+    return _EXT_TO_LANG.get(os.path.splitext(filename)[1].lower(), 'text')
 
 
 def smart_chunk_content(
@@ -116,58 +235,53 @@ def smart_chunk_content(
     if overlap_size is None:
         overlap_size = settings.processing.overlap
 
-    # If content is small enough, return as single chunk
-    total_tokens = count_tokens(content)
+    # If content is small enough, return as single chunk. Content that fits even by the byte-length bound needs no
+    # tokenizing at all.
+    if token_upper_bound(content) <= chunk_size:
+        return [(content, 0, content.count('\n'))]
+    total_tokens = approx_count_tokens(content)
     if total_tokens <= chunk_size:
-        lines = content.split('\n')
-        return [(content, 0, len(lines) - 1)]
+        return [(content, 0, content.count('\n'))]
 
     logger.debug(f'Chunking {filename} with {total_tokens} tokens into chunks of {chunk_size}')
 
     # Get language and find code boundaries
     language = get_language_from_extension(filename)
-    boundaries = find_code_boundaries(content, language)
+    boundary_lines = [line for line, _ in find_code_boundaries(content, language)]
 
     lines = content.split('\n')
+    # Offset of the start of each line (plus one past the end), so chunk texts are sliced out of the content directly
+    line_starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
     chunks: list[tuple[str, int, int]] = []
-    current_chunk_lines: list[str] = []
     current_chunk_start = 0
-    current_tokens = 0
-
-    for i, line in enumerate(lines):
-        line_tokens = count_tokens(line + '\n')
-
-        # Check if adding this line would exceed chunk size
-        if current_tokens + line_tokens > chunk_size and current_chunk_lines:
-            # Find the best boundary to split at
+    # Tokenize every line up front rather than once per loop iteration; the prefix sums give the token count of any
+    # run of lines as cumulative_tokens[end] - cumulative_tokens[start]
+    line_token_counts = count_tokens_serial(line + '\n' for line in lines)
+    cumulative_tokens = list(accumulate(line_token_counts, initial=0))
+
+    for i, line_tokens in enumerate(line_token_counts):
+        # Check if adding this line would exceed chunk size; the current chunk holds lines current_chunk_start..i-1
+        if cumulative_tokens[i + 1] - cumulative_tokens[current_chunk_start] > chunk_size and i > current_chunk_start:
+            # Find the best boundary to split at: the last code boundary in (current_chunk_start, i] that keeps the
+            # chunk under the limit. Boundaries are sorted and the prefix sums grow, so walk back from the last one.
             best_boundary = i
-
-            # Look for nearby code boundaries
-            for boundary_line, _ in boundaries:
-                if current_chunk_start < boundary_line <= i:
-                    # Check if splitting at this boundary keeps us under the limit
-                    test_chunk = '\n'.join(lines[current_chunk_start:boundary_line])
-                    if count_tokens(test_chunk) <= chunk_size:
-                        best_boundary = boundary_line
+            first = bisect_right(boundary_lines, current_chunk_start)
+            for k in range(bisect_right(boundary_lines, i) - 1, first - 1, -1):
+                if cumulative_tokens[boundary_lines[k]] - cumulative_tokens[current_chunk_start] <= chunk_size:
+                    best_boundary = boundary_lines[k]
+                    break
 
             # Create chunk up to the best boundary
             chunk_end = best_boundary - 1
-            chunk_text = '\n'.join(current_chunk_lines[: chunk_end - current_chunk_start + 1])
+            chunk_text = content[line_starts[current_chunk_start] : line_starts[chunk_end + 1] - 1]
             chunks.append((chunk_text, current_chunk_start, chunk_end))
 
             # Start new chunk with overlap
             overlap_start = max(0, chunk_end - overlap_size // (line_tokens or 1))
             current_chunk_start = overlap_start
-            current_chunk_lines = lines[overlap_start : i + 1]
-            current_tokens = count_tokens('\n'.join(current_chunk_lines))
-        else:
-            current_chunk_lines.append(line)
-            current_tokens += line_tokens
 
     # Add the last chunk
-    if current_chunk_lines:
-        chunk_text = '\n'.join(current_chunk_lines)
-        chunks.append((chunk_text, current_chunk_start, len(lines) - 1))
+    chunks.append((content[line_starts[current_chunk_start] :], current_chunk_start, len(lines) - 1))
 
     logger.info(f'Created {len(chunks)} chunks from {filename}')
     return chunks
@@ -184,41 +298,65 @@ def merge_chunk_responses(responses: list[str], overlap_size: int | None = None)
     if overlap_size is None:
         overlap_size = settings.processing.overlap
 
-    merged = responses[0]
+    # Build the merged text as a list of lines and join it once at the end, rather than re-splitting and re-joining
+    # the growing result for every response
+    merged_lines = responses[0].split('\n')
 
-    for i in range(1, len(responses)):
-        current_response = responses[i]
-
-        # Try to find overlapping content
-        overlap_found = False
-
-        # Look for common lines at the boundary
-        merged_lines = merged.split('\n')
+    for current_response in responses[1:]:
         current_lines = current_response.split('\n')
 
-        # Try different overlap sizes
+        # Try different overlap sizes, largest first; comparing the boundary line first skips most slice compares
         for overlap_check in range(min(len(merged_lines), len(current_lines), 10), 0, -1):
-            if merged_lines[-overlap_check:] == current_lines[:overlap_check]:
+            if (
+                merged_lines[-1] == current_lines[overlap_check - 1]
+                and merged_lines[-overlap_check:] == current_lines[:overlap_check]
+            ):
                 # Found overlap, merge without duplication
-                merged = '\n'.join(merged_lines + current_lines[overlap_check:])
-                overlap_found = True
+                merged_lines.extend(current_lines[overlap_check:])
                 break
-
-        if not overlap_found:
+        else:
             # No overlap found, append with separator
-            merged += '\n\n---\n\n' + current_response
+            merged_lines.extend(['', '---', ''])
+            merged_lines.extend(current_lines)
+
+    return '\n'.join(merged_lines)
+
 
-    return merged
+def _format_context(parts: list[tuple[str, str]]) -> tuple[str, str]:
+    """Build a (context_description, context_content) tuple from (chunk_description, chunk_text) parts.
+
+    The content is written into a single buffer rather than formatting a copy of every part and joining those.
+    """
+    buffer = io.StringIO()
+    for i, (desc, text) in enumerate(parts):
+        if i:
+            buffer.write('\n\n')
+        buffer.write('### ')
+        buffer.write(desc)
+        buffer.write('\n\n')
+        buffer.write(text)
+    return f'Context with {len(parts)} parts', buffer.getvalue()
+
+
+def _chunk_and_count(content: str, filename: str) -> list[tuple[tuple[str, int, int], int]]:
+    """Chunk a file and count the tokens of each chunk, returning (chunk, token_count) pairs.
+
+    Runs on a worker thread of `prepare_chunked_context`, so the counting is serial rather than starting a
+    tokenizer thread pool inside the chunking pool.
+    """
+    chunks = smart_chunk_content(content, filename)
+    return list(zip(chunks, count_tokens_serial(chunk_text for chunk_text, _, _ in chunks), strict=True))
 
 
 def prepare_chunked_context(
     files_content: list[tuple[str, str]],  # List of (filename, content) tuples
     query: str,
     max_context_size: int | None = None,
-) -> list[tuple[str, str]]:
+) -> Iterator[tuple[str, str]]:
     """Prepare chunked context from multiple files for processing.
 
-    Returns list of (context_description, context_content) tuples.
+    Yields (context_description, context_content) tuples as soon as each context is filled, so callers can process
+    one context at a time instead of holding all of them in memory.
     """
     if max_context_size is None:
         max_context_size = settings.gemini.max_tokens
@@ -230,41 +368,42 @@ def prepare_chunked_context(
 
     logger.debug(f'Available tokens for context: {available_tokens}')
 
-    all_chunks: list[tuple[str, str]] = []
-
-    # Process each file
-    for filename, content in files_content:
-        file_chunks = smart_chunk_content(content, filename)
-        for chunk_text, start_line, end_line in file_chunks:
-            chunk_desc = f'{filename} (lines {start_line + 1}-{end_line + 1})'
-            all_chunks.append((chunk_desc, chunk_text))
-
     # Group chunks into contexts that fit within token limits
-    contexts: list[tuple[str, str]] = []
+    context_count = 0
     current_context_parts: list[tuple[str, str]] = []
     current_context_tokens = 0
 
-    for chunk_desc, chunk_text in all_chunks:
-        chunk_tokens = count_tokens(chunk_text)
-
-        if current_context_tokens + chunk_tokens > available_tokens and current_context_parts:
-            # Create context from current parts
-            context_desc = f'Context with {len(current_context_parts)} parts'
-            context_content = '\n\n'.join([f'### {desc}\n\n{text}' for desc, text in current_context_parts])
-            contexts.append((context_desc, context_content))
-
-            # Start new context
-            current_context_parts = [(chunk_desc, chunk_text)]
-            current_context_tokens = chunk_tokens
-        else:
-            current_context_parts.append((chunk_desc, chunk_text))
-            current_context_tokens += chunk_tokens
-
-    # Add remaining context
+    # Chunk the files in parallel: they are independent and the tokenizer releases the GIL while encoding. Files are
+    # submitted through a window of two per worker and consumed in order, so only a bounded number of chunked files
+    # wait in memory however many files there are.
+    workers = os.cpu_count() or 1
+    files = iter(files_content)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight: deque[tuple[str, Future[list[tuple[tuple[str, int, int], int]]]]] = deque(
+            (filename, executor.submit(_chunk_and_count, content, filename))
+            for filename, content in islice(files, 2 * workers)
+        )
+        while in_flight:
+            filename, future = in_flight.popleft()
+            for next_filename, next_content in islice(files, 1):
+                in_flight.append((next_filename, executor.submit(_chunk_and_count, next_content, next_filename)))
+
+            for (chunk_text, start_line, end_line), chunk_tokens in future.result():
+                chunk_desc = f'{filename} (lines {start_line + 1}-{end_line + 1})'
+
+                if current_context_tokens + chunk_tokens > available_tokens and current_context_parts:
+                    # Emit the context from current parts and start a new one
+                    yield _format_context(current_context_parts)
+                    context_count += 1
+                    current_context_parts = [(chunk_desc, chunk_text)]
+                    current_context_tokens = chunk_tokens
+                else:
+                    current_context_parts.append((chunk_desc, chunk_text))
+                    current_context_tokens += chunk_tokens
+
+    # Emit remaining context
     if current_context_parts:
-        context_desc = f'Context with {len(current_context_parts)} parts'
-        context_content = '\n\n'.join([f'### {desc}\n\n{text}' for desc, text in current_context_parts])
-        contexts.append((context_desc, context_content))
+        yield _format_context(current_context_parts)
+        context_count += 1
 
-    logger.info(f'Prepared {len(contexts)} contexts from {len(files_content)} files')
-    return contexts
+    logger.info(f'Prepared {context_count} contexts from {len(files_content)} files')
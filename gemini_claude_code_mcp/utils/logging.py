@@ -8,12 +8,11 @@ import logging.handlers
 import sys
 import time
 import types
+from collections.abc import Mapping
 from pathlib import Path
 from typing import Any, Callable, TypeVar, cast
 
 import structlog
-from rich.console import Console
-from rich.logging import RichHandler
 
 from gemini_claude_code_mcp.config.settings import settings
 
@@ -31,25 +30,31 @@ def setup_logging(level: str | None, log_file: str | None, use_rich: bool = True
     log_file_path = log_file or settings.logging.file
 
     # Configure structlog
-    structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt='iso'),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
+    processors: list[structlog.types.Processor] = [
+        structlog.stdlib.filter_by_level,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.TimeStamper(fmt='iso'),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder(),
+    ]
+    # Callsite details need a stack walk per record, so they are only added when debugging
+    if log_level == 'DEBUG':
+        processors.append(
             structlog.processors.CallsiteParameterAdder(
                 parameters=[
                     structlog.processors.CallsiteParameter.FILENAME,
                     structlog.processors.CallsiteParameter.FUNC_NAME,
                     structlog.processors.CallsiteParameter.LINENO,
                 ]
-            ),
-            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
-        ],
+            )
+        )
+    processors.append(structlog.stdlib.ProcessorFormatter.wrap_for_formatter)
+
+    structlog.configure(
+        processors=processors,
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=True,
@@ -63,8 +68,12 @@ def setup_logging(level: str | None, log_file: str | None, use_rich: bool = True
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
 
-    # Console handler
+    # Console handler (rich is only imported when requested)
+    console_handler: logging.Handler
     if use_rich:
+        from rich.console import Console
+        from rich.logging import RichHandler
+
         console = Console(stderr=True)
         console_handler = RichHandler(console=console, rich_tracebacks=True, tracebacks_show_locals=True, markup=True)
     else:
@@ -116,15 +125,11 @@ class LogContext:
     def __init__(self, **kwargs: Any):
         """Initialize with context variables."""
         self.context = kwargs
-        self._tokens: list[contextvars.Token[Any]] = []
+        self._tokens: Mapping[str, contextvars.Token[Any]] = {}
 
     def __enter__(self):
         """Enter context and bind variables."""
-        for key, value in self.context.items():
-            token_mapping = structlog.contextvars.bind_contextvars(**{key: value})
-            # Extract individual tokens from the mapping
-            for token in token_mapping.values():
-                self._tokens.append(token)
+        self._tokens = structlog.contextvars.bind_contextvars(**self.context)
         return self
 
     def __exit__(
@@ -133,9 +138,9 @@ class LogContext:
         exc_val: BaseException | None,
         exc_tb: types.TracebackType | None,
     ) -> None:
-        """Exit context and clear variables."""
-        # Clear all context variables at once
-        structlog.contextvars.clear_contextvars()
+        """Exit context and restore the variables it bound to their previous values."""
+        # Other context variables, e.g. those bound by an enclosing LogContext, are left untouched
+        structlog.contextvars.reset_contextvars(**self._tokens)
         # Return None to propagate any exception
         return None
 
@@ -147,22 +152,35 @@ F = TypeVar('F', bound=Callable[..., Any])
 
 def log_performance(func: F) -> F:
     """Decorator to log function performance."""
+    # Bound once per decorated function rather than on every call, like the module-level loggers. The stdlib logger
+    # behind it is checked on each call so the success record is not built at all when INFO is disabled; failures
+    # are always logged.
+    logger = get_logger(func.__module__)
+    level_logger = logging.getLogger(func.__module__)
+
     if asyncio.iscoroutinefunction(func):
 
         @functools.wraps(func)
         async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
-            logger = get_logger(func.__module__)
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
 
             try:
                 result = await func(*args, **kwargs)
-                duration = time.time() - start_time
-                logger.info('Function completed', function=func.__name__, duration=f'{duration:.3f}s', status='success')
+                if level_logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        'Function completed',
+                        function=func.__name__,
+                        duration_ms=(time.perf_counter_ns() - start_time) / 1e6,
+                        status='success',
+                    )
                 return result
             except Exception as e:
-                duration = time.time() - start_time
                 logger.error(
-                    'Function failed', function=func.__name__, duration=f'{duration:.3f}s', status='error', error=str(e)
+                    'Function failed',
+                    function=func.__name__,
+                    duration_ms=(time.perf_counter_ns() - start_time) / 1e6,
+                    status='error',
+                    error=str(e),
                 )
                 raise
 
@@ -171,18 +189,25 @@ def log_performance(func: F) -> F:
 
         @functools.wraps(func)
         def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
-            logger = get_logger(func.__module__)
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
 
             try:
                 result = func(*args, **kwargs)
-                duration = time.time() - start_time
-                logger.info('Function completed', function=func.__name__, duration=f'{duration:.3f}s', status='success')
+                if level_logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        'Function completed',
+                        function=func.__name__,
+                        duration_ms=(time.perf_counter_ns() - start_time) / 1e6,
+                        status='success',
+                    )
                 return result
             except Exception as e:
-                duration = time.time() - start_time
                 logger.error(
-                    'Function failed', function=func.__name__, duration=f'{duration:.3f}s', status='error', error=str(e)
+                    'Function failed',
+                    function=func.__name__,
+                    duration_ms=(time.perf_counter_ns() - start_time) / 1e6,
+                    status='error',
+                    error=str(e),
                 )
                 raise
 
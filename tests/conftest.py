@@ -0,0 +1,42 @@
+"""Shared pytest configuration."""
+
+import asyncio
+import functools
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Callable
+
+import pytest
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config) -> None:
+    """Put pytest's temporary directories on tmpfs when available, since the fixtures write whole projects to disk.
+
+    pytest empties an explicit base directory before using it, so each run gets a fresh directory of its own and
+    concurrent runs cannot wipe each other's files. It is removed when the run ends.
+
+    Also points the analyzer's disk cache at an empty directory of its own for the run. Settings are read when the
+    package is first imported, which happens after this hook, so the environment variable is seen by every test.
+    """
+    if config.option.basetemp is None and sys.platform == 'linux' and os.access('/dev/shm', os.W_OK):
+        basetemp = tempfile.mkdtemp(prefix='pytest-', dir='/dev/shm')
+        config.add_cleanup(functools.partial(shutil.rmtree, basetemp, ignore_errors=True))
+        config.option.basetemp = basetemp
+
+    cache_dir = tempfile.mkdtemp(prefix='gemini-claude-code-mcp-cache-')
+    config.add_cleanup(functools.partial(shutil.rmtree, cache_dir, ignore_errors=True))
+    os.environ['CACHE__DIRECTORY'] = cache_dir
+
+
+def pytest_asyncio_loop_factories(
+    config: pytest.Config, item: pytest.Item
+) -> dict[str, Callable[[], asyncio.AbstractEventLoop]]:
+    """Run the async tests on uvloop when it is installed, for its lower per-await scheduling overhead."""
+    try:
+        import uvloop
+    except ImportError:
+        return {'asyncio': asyncio.new_event_loop}
+    return {'uvloop': uvloop.new_event_loop}
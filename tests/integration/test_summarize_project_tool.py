@@ -1,37 +1,113 @@
 """Integration test for summarize_project tool."""
 
-import json
+import hashlib
+import os
+import shutil
+from collections.abc import AsyncIterator, Callable, Sequence
 from pathlib import Path
 from typing import Any
 
+import orjson
 import pytest
+import pytest_asyncio
 from fastmcp import Client, FastMCP
+from mcp.types import TextContent
 from syrupy.assertion import SnapshotAssertion
+from vcr.request import Request
 
+from gemini_claude_code_mcp.config.settings import get_settings
 from gemini_claude_code_mcp.tools.summarize_project_tool import register_summarize_project_tool
 
+# Tests that call Gemini replay the HTTP exchanges recorded in their cassette, so they run without network access or
+# an API key. Recording (or re-recording after a prompt change) needs RUN_GEMINI_INTEGRATION=1 and a real key.
+CASSETTE_DIR = Path(__file__).parent / 'cassettes' / Path(__file__).stem
+
+
+def requires_gemini(test: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark a test that calls Gemini to replay its cassette, skipping it if none is recorded and recording is off."""
+    recorded = (CASSETTE_DIR / f'{test.__name__}.yaml').exists()
+    skip = pytest.mark.skipif(
+        not recorded and not os.getenv('RUN_GEMINI_INTEGRATION'),
+        reason='no recorded cassette; run `make test-gemini` to record it against the live Gemini API',
+    )
+    return skip(pytest.mark.usefixtures('gemini_api_key')(pytest.mark.vcr(test)))
+
+
+def _response_payload(result: Sequence[Any]) -> dict[str, Any]:
+    """Return the tool's response dict from a call_tool result.
+
+    Reads structured content when the result carries it, and otherwise decodes the JSON text content.
+    """
+    structured = getattr(result[0], 'structuredContent', None)
+    if structured is not None:
+        return structured
+    assert isinstance(result[0], TextContent), 'Result should be text content'
+    return orjson.loads(result[0].text)
+
+
+# Response fields holding the parsed Gemini summary
+_SUMMARY_SECTIONS = (
+    'overview',
+    'tech_stack',
+    'architecture',
+    'components',
+    'key_features',
+    'dependencies',
+    'code_quality',
+)
+
+
+@pytest.fixture(scope='module')
+def vcr_config(tmp_path_factory: pytest.TempPathFactory) -> dict[str, Any]:
+    """Configure cassette recording: keep the API key out of cassettes and match requests on their content.
+
+    Prompts embed the absolute path of the test project, which changes between runs, so the pytest temp directory is
+    replaced with a placeholder in request bodies before they are recorded or matched. They also embed the whole
+    project, so cassettes store a digest of each request body rather than the body itself.
+    """
+    base_temp = str(tmp_path_factory.getbasetemp()).encode()
+
+    def digest_body(request: Request) -> Request:
+        # vcr runs this again on requests it has already filtered while matching them, so a digest is left alone
+        if isinstance(request.body, bytes) and not request.body.startswith(b'{"blake2b":'):
+            body = request.body.replace(base_temp, b'<pytest-tmp>')
+            # Kept as JSON, since vcr decodes JSON request bodies before comparing them
+            request.body = orjson.dumps({'blake2b': hashlib.blake2b(body, digest_size=16).hexdigest()})
+        return request
+
+    return {
+        'filter_headers': ['x-goog-api-key'],
+        'filter_query_parameters': ['key'],
+        'match_on': ['method', 'uri', 'body'],
+        'before_record_request': digest_body,
+    }
+
 
 @pytest.fixture
+def gemini_api_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Give the Gemini client a placeholder key when none is configured, since replayed requests never reach the API."""
+    gemini_settings = get_settings().gemini
+    if not gemini_settings.api_key:
+        monkeypatch.setattr(gemini_settings, 'api_key', 'cassette-replay')
+
+
+@pytest.fixture(scope='session')
 def mcp_server() -> FastMCP[Any]:
-    """Create MCP server with summarize_project tool registered."""
+    """Create MCP server with summarize_project tool registered, shared by all tests since none of them modify it."""
     server: FastMCP[Any] = FastMCP('TestServer')
     register_summarize_project_tool(server)
     return server
 
 
-@pytest.fixture
-def test_project_dir(tmp_path: Path) -> Path:
-    """Create a minimal test project structure."""
-    # Create project structure
-    project_dir = tmp_path / 'test_project'
-    project_dir.mkdir()
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def client(mcp_server: FastMCP[Any]) -> AsyncIterator[Client[Any]]:
+    """Connect one MCP client to the test server, shared by all tests to pay for the handshake once."""
+    async with Client(mcp_server) as client:
+        yield client
 
-    # Create some Python files
-    src_dir = project_dir / 'src'
-    src_dir.mkdir()
 
-    # Main module
-    main_py_content = """\"\"\"Main module for test project.\"\"\"
+# Files of the minimal test project, kept as bytes so the fixture writes them without encoding
+_MAIN_PY = b"""\"\"\"Main module for test project.\"\"\"
 
     from typing import List
 
@@ -57,10 +133,8 @@ def test_project_dir(tmp_path: Path) -> Path:
         calc = Calculator()
         print(calc.add(5, 3))
     """
-    (src_dir / 'main.py').write_text(main_py_content)
 
-    # Utils module
-    utils_py_content = """\"\"\"Utility functions for the project.\"\"\"
+_UTILS_PY = b"""\"\"\"Utility functions for the project.\"\"\"
 
     import json
     from pathlib import Path
@@ -82,13 +156,8 @@ def test_project_dir(tmp_path: Path) -> Path:
         \"\"\"Convert string path to Path object.\"\"\"
         return Path(path).resolve()
     """
-    (src_dir / 'utils.py').write_text(utils_py_content)
 
-    # Create tests directory
-    tests_dir = project_dir / 'tests'
-    tests_dir.mkdir()
-
-    test_main_content = """\"\"\"Tests for main module.\"\"\"
+_TEST_MAIN_PY = b"""\"\"\"Tests for main module.\"\"\"
 
     from src.main import Calculator, process_items
 
@@ -103,10 +172,8 @@ def test_project_dir(tmp_path: Path) -> Path:
         result = process_items(items)
         assert result == ['HELLO', 'WORLD']
     """
-    (tests_dir / 'test_main.py').write_text(test_main_content)
 
-    # Create configuration files
-    pyproject_content = """[project]
+_PYPROJECT_TOML = b"""[project]
     name = "test-project"
     version = "0.1.0"
     description = "A test project for integration testing"
@@ -118,9 +185,8 @@ def test_project_dir(tmp_path: Path) -> Path:
     requires = ["setuptools>=61.0"]
     build-backend = "setuptools.build_meta"
     """
-    (project_dir / 'pyproject.toml').write_text(pyproject_content)
 
-    readme_content = """# Test Project
+_README_MD = b"""# Test Project
 
     This is a minimal test project for integration testing the summarize_project tool.
 
@@ -139,156 +205,164 @@ def test_project_dir(tmp_path: Path) -> Path:
     result = calc.add(10, 20)
     ```
     """
-    (project_dir / 'README.md').write_text(readme_content)
 
-    # Add .gitignore
-    gitignore_content = """__pycache__/
+_GITIGNORE = b"""__pycache__/
     *.pyc
     .pytest_cache/
     """
-    (project_dir / '.gitignore').write_text(gitignore_content)
+
+
+@pytest.fixture(scope='session')
+def test_project_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Create a minimal test project structure, once per session since no test modifies it."""
+    # Create project structure
+    project_dir = tmp_path_factory.mktemp('projects') / 'test_project'
+
+    # Create some Python files, creating the project directory along with src
+    src_dir = project_dir / 'src'
+    src_dir.mkdir(parents=True)
+
+    (src_dir / 'main.py').write_bytes(_MAIN_PY)
+    (src_dir / 'utils.py').write_bytes(_UTILS_PY)
+
+    # Create tests directory
+    tests_dir = project_dir / 'tests'
+    tests_dir.mkdir()
+    (tests_dir / 'test_main.py').write_bytes(_TEST_MAIN_PY)
+
+    # Create configuration files
+    (project_dir / 'pyproject.toml').write_bytes(_PYPROJECT_TOML)
+    (project_dir / 'README.md').write_bytes(_README_MD)
+    (project_dir / '.gitignore').write_bytes(_GITIGNORE)
 
     return project_dir
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope='session')
 async def test_summarize_project_basic(
-    mcp_server: FastMCP[Any], test_project_dir: Path, snapshot: SnapshotAssertion
+    client: Client[Any], test_project_dir: Path, snapshot: SnapshotAssertion
 ) -> None:
     """Test basic project summarization with real Gemini API."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'summarize_project',
-            {
-                'directory_path': str(test_project_dir),
-            },
-        )
-
-        # Extract the response
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        response = json.loads(result[0].text)  # type: ignore  # type: ignore
-
-        # Verify structure
-        assert response['status'] == 'success'
-        assert response['project_path'] == str(test_project_dir)
-        assert 'overview' in response
-        assert 'structure' in response
-        assert 'statistics' in response
-        assert 'analysis_details' in response
-
-        # Verify statistics are accurate
-        stats = response['statistics']
-        assert stats['total_files'] == 3  # main.py, utils.py, test_main.py (only .py files by default)
-        assert stats['languages']['python'] == 3
-
-        # Verify structure
-        structure = response['structure']
-        assert structure['name'] == 'test_project'
-        assert 'src' in structure['children']
-        assert 'main.py' in structure['children']['src']['children']
-        assert 'utils.py' in structure['children']['src']['children']
-
-        # Create a deterministic snapshot by removing variable data
-        snapshot_data = {
-            'status': response['status'],
-            'structure': response['structure'],
-            'statistics': response['statistics'],
-            'has_overview': bool(response.get('overview')),
-            'has_tech_stack': bool(response.get('tech_stack')),
-            'has_architecture': bool(response.get('architecture')),
-            'has_components': bool(response.get('components')),
-            'analysis_details': {
-                'files_analyzed': response['analysis_details']['files_analyzed'],
-                'used_gemini': response['analysis_details']['used_gemini'],
-            },
-        }
-
-        # Compare with snapshot
-        assert snapshot_data == snapshot
-
-
-@pytest.mark.asyncio
+    result = await client.call_tool(
+        'summarize_project',
+        {
+            'directory_path': str(test_project_dir),
+        },
+    )
+
+    # Extract the response
+    response = _response_payload(result)
+
+    # Verify structure
+    assert response['status'] == 'success'
+    assert response['project_path'] == str(test_project_dir)
+    assert {'overview', 'structure', 'statistics', 'analysis_details'} <= response.keys()
+
+    # Verify statistics are accurate
+    stats = response['statistics']
+    assert stats['total_files'] == 3  # main.py, utils.py, test_main.py (only .py files by default)
+    assert stats['languages']['python'] == 3
+
+    # Verify structure
+    structure = response['structure']
+    assert structure['name'] == 'test_project'
+    assert {'src'} <= structure['children'].keys()
+    assert {'main.py', 'utils.py'} <= structure['children']['src']['children'].keys()
+
+    # Create a deterministic snapshot by removing variable data
+    snapshot_data = {
+        'status': response['status'],
+        'structure': response['structure'],
+        'statistics': response['statistics'],
+        'has_overview': bool(response.get('overview')),
+        'has_tech_stack': bool(response.get('tech_stack')),
+        'has_architecture': bool(response.get('architecture')),
+        'has_components': bool(response.get('components')),
+        'analysis_details': {
+            'files_analyzed': response['analysis_details']['files_analyzed'],
+            'used_gemini': response['analysis_details']['used_gemini'],
+        },
+    }
+
+    # Compare with snapshot
+    assert snapshot_data == snapshot
+
+
+@pytest.mark.asyncio(loop_scope='session')
 async def test_summarize_project_with_focus_areas(
-    mcp_server: FastMCP[Any], test_project_dir: Path, snapshot: SnapshotAssertion
+    client: Client[Any], test_project_dir: Path, snapshot: SnapshotAssertion
 ) -> None:
     """Test project summarization with focus areas."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'summarize_project',
-            {
-                'directory_path': str(test_project_dir),
-                'focus_areas': ['testing', 'calculator'],
-                'include_patterns': ['*.py'],
-            },
-        )
-
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        response = json.loads(result[0].text)  # type: ignore
-
-        assert response['status'] == 'success'
-        assert response['statistics']['total_files'] == 3  # Only Python files
-
-        # Create snapshot data
-        snapshot_data = {
-            'status': response['status'],
-            'files_analyzed': response['analysis_details']['files_analyzed'],
-            'total_files': response['statistics']['total_files'],
-            'languages': response['statistics']['languages'],
-        }
+    result = await client.call_tool(
+        'summarize_project',
+        {
+            'directory_path': str(test_project_dir),
+            'focus_areas': ['testing', 'calculator'],
+            'include_patterns': ['*.py'],
+        },
+    )
 
-        assert snapshot_data == snapshot
+    response = _response_payload(result)
 
+    assert response['status'] == 'success'
+    assert response['statistics']['total_files'] == 3  # Only Python files
 
-@pytest.mark.asyncio
-async def test_summarize_project_invalid_directory(mcp_server: FastMCP[Any]) -> None:
+    # Create snapshot data
+    snapshot_data = {
+        'status': response['status'],
+        'files_analyzed': response['analysis_details']['files_analyzed'],
+        'total_files': response['statistics']['total_files'],
+        'languages': response['statistics']['languages'],
+    }
+
+    assert snapshot_data == snapshot
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_summarize_project_invalid_directory(client: Client[Any]) -> None:
     """Test error handling for invalid directory."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'summarize_project',
-            {
-                'directory_path': '/non/existent/directory',
-            },
-        )
+    result = await client.call_tool(
+        'summarize_project',
+        {
+            'directory_path': '/non/existent/directory',
+        },
+    )
 
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        response = json.loads(result[0].text)  # type: ignore
+    response = _response_payload(result)
 
-        assert response['status'] == 'failed'
-        assert 'error' in response
-        assert 'Directory not found' in response['error']
+    assert response['status'] == 'failed'
+    assert 'error' in response
+    assert 'Directory not found' in response['error']
 
 
-@pytest.mark.asyncio
-async def test_summarize_project_empty_directory(mcp_server: FastMCP[Any], tmp_path: Path) -> None:
+@pytest.mark.asyncio(loop_scope='session')
+async def test_summarize_project_empty_directory(client: Client[Any], tmp_path: Path) -> None:
     """Test handling of empty directory."""
     empty_dir = tmp_path / 'empty_project'
     empty_dir.mkdir()
 
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'summarize_project',
-            {
-                'directory_path': str(empty_dir),
-            },
-        )
+    result = await client.call_tool(
+        'summarize_project',
+        {
+            'directory_path': str(empty_dir),
+        },
+    )
 
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        response = json.loads(result[0].text)  # type: ignore
+    response = _response_payload(result)
 
-        assert response['status'] == 'failed'
-        assert 'No files found' in response['error']
+    assert response['status'] == 'failed'
+    assert 'No files found' in response['error']
 
 
-@pytest.fixture
-def large_test_project_dir(tmp_path: Path) -> Path:
-    """Create a large test project that exceeds Claude's context limit."""
-    project_dir = tmp_path / 'large_test_project'
-    project_dir.mkdir()
+@pytest.fixture(scope='session')
+def large_test_project_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Create a large test project that exceeds Claude's context limit, once per session."""
+    # Not numbered, so the path embedded in the recorded prompt does not depend on which fixtures ran first
+    project_dir = tmp_path_factory.mktemp('large_projects', numbered=False) / 'large_test_project'
 
-    # Create many Python files with substantial content
+    # Create many Python files with substantial content, creating the project directory along with src
     src_dir = project_dir / 'src'
-    src_dir.mkdir()
+    src_dir.mkdir(parents=True)
 
     # Generate enough content to exceed 200k tokens but stay under 1M
     # Each file will have ~15000 tokens, so we need about 15 files to get ~225k tokens
@@ -411,40 +485,55 @@ class Component{i}:
         ]
     )
 
-    # Create 15 files to exceed token limit but stay under Gemini's limit
-    for i in range(15):
+    # Create 15 files to exceed token limit but stay under Gemini's limit. They are identical, so the content is
+    # written once and the other files are hard links to it (copies where the filesystem has no hard links).
+    first_file = src_dir / 'component_0.py'
+    first_file.write_text(large_file_content)
+    for i in range(1, 15):
         file_path = src_dir / f'component_{i}.py'
-        file_path.write_text(large_file_content)
+        try:
+            os.link(first_file, file_path)
+        except OSError:
+            shutil.copyfile(first_file, file_path)
 
     return project_dir
 
 
-@pytest.mark.asyncio
+@requires_gemini
+@pytest.mark.asyncio(loop_scope='session')
 async def test_summarize_large_project_uses_gemini(
-    mcp_server: FastMCP[Any], large_test_project_dir: Path, snapshot: SnapshotAssertion
+    client: Client[Any], large_test_project_dir: Path, snapshot: SnapshotAssertion
 ) -> None:
     """Test that large projects trigger Gemini usage."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'summarize_project',
-            {
-                'directory_path': str(large_test_project_dir),
-            },
-        )
-
-        assert hasattr(result[0], 'text'), 'Result should have text attribute'
-        response = json.loads(result[0].text)  # type: ignore
-
-        assert response == snapshot
-
-        # Verify the request succeeded
-        assert response['status'] == 'success'
-
-        # Most importantly: verify Gemini was actually used!
-        assert response['analysis_details']['used_gemini'] is True
-        assert response['analysis_details']['chunks_processed'] > 0
+    result = await client.call_tool(
+        'summarize_project',
+        {
+            'directory_path': str(large_test_project_dir),
+        },
+    )
 
-        # Verify we processed a large number of files
-        assert response['statistics']['total_files'] == 15
-        assert response['analysis_details']['total_tokens'] > 200000  # Exceeds Claude's limit
-        assert response['analysis_details']['total_tokens'] < 1000000  # But stays under Gemini's limit
+    response = _response_payload(result)
+
+    # The project path changes every run (and with it the token count of the prompt that embeds it), and Gemini's
+    # prose changes whenever the cassette is re-recorded, so the snapshot keeps the rest of the response and only
+    # records whether each section of the summary was filled
+    snapshot_data = dict(response)
+    del snapshot_data['project_path']
+    analysis_details = snapshot_data['analysis_details'] = dict(response['analysis_details'])
+    total_tokens = analysis_details.pop('total_tokens')
+    for key in _SUMMARY_SECTIONS:
+        snapshot_data[key] = bool(snapshot_data[key])
+    assert snapshot_data == snapshot
+    assert total_tokens > get_settings().context_limits.claude_max_tokens
+
+    # Verify the request succeeded
+    assert response['status'] == 'success'
+
+    # Most importantly: verify Gemini was actually used!
+    assert response['analysis_details']['used_gemini'] is True
+    assert response['analysis_details']['chunks_processed'] > 0
+
+    # Verify we processed a large number of files
+    assert response['statistics']['total_files'] == 15
+    assert response['analysis_details']['total_tokens'] > 200000  # Exceeds Claude's limit
+    assert response['analysis_details']['total_tokens'] < 1000000  # But stays under Gemini's limit
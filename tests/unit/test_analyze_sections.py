@@ -0,0 +1,137 @@
+"""Unit tests for LargeContextAnalyzer.analyze_sections."""
+
+import re
+from pathlib import Path
+
+import pytest
+
+from gemini_claude_code_mcp.config.settings import CacheSettings
+from gemini_claude_code_mcp.services import large_context_analyzer
+from gemini_claude_code_mcp.services.large_context_analyzer import LargeContextAnalyzer
+from gemini_claude_code_mcp.services.result_cache import DiskResultCache
+
+
+class FakeGemini:
+    """Replacement for gemini_text_to_text that records prompts and answers chunk and synthesis prompts.
+
+    Prompts containing `fail_on` get no response, like a chunk whose request failed.
+    """
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+        self.fail_on: str | None = None
+
+    async def __call__(self, prompt: str) -> str | None:
+        self.prompts.append(prompt)
+        if self.fail_on is not None and self.fail_on in prompt:
+            return None
+        if prompt.startswith('You analyzed'):
+            return 'synthesis'
+        return f'findings {len(self.prompts)}'
+
+    def chunk_line_ranges(self) -> list[tuple[int, int]]:
+        return [
+            (int(match[1]), int(match[2]))
+            for prompt in self.prompts
+            if (match := re.search(r'Content \(lines (\d+)-(\d+)\)', prompt))
+        ]
+
+
+@pytest.fixture
+def gemini(monkeypatch: pytest.MonkeyPatch) -> FakeGemini:
+    fake = FakeGemini()
+    monkeypatch.setattr(large_context_analyzer, 'gemini_text_to_text', fake)
+    return fake
+
+
+@pytest.fixture
+def analyzer() -> LargeContextAnalyzer:
+    """An analyzer without a disk cache whose chunks hold at most 10 tokens."""
+    analyzer = LargeContextAnalyzer()
+    analyzer.disk_cache = None
+    analyzer.claude_limit = 5
+    analyzer.gemini_limit = 1010
+    return analyzer
+
+
+@pytest.mark.asyncio
+async def test_content_within_claude_limit_is_returned_without_gemini(
+    analyzer: LargeContextAnalyzer, gemini: FakeGemini
+) -> None:
+    result = await analyzer.analyze_sections('query', [('a\n', 2), ('b\n', 3)])
+
+    assert gemini.prompts == []
+    assert result.used_gemini is False
+    assert result.content == 'a\nb\n'
+    assert result.total_tokens == 5
+
+
+@pytest.mark.asyncio
+async def test_sections_are_packed_into_chunks_with_their_line_ranges(
+    analyzer: LargeContextAnalyzer, gemini: FakeGemini
+) -> None:
+    sections = [('a\nb\n', 6), ('c\n', 3), ('d\n', 2), ('e\nf', 4)]
+
+    result = await analyzer.analyze_sections('query', sections)
+
+    assert gemini.chunk_line_ranges() == [(0, 2), (3, 5)]
+    assert 'a\nb\nc\n\n' in gemini.prompts[0]
+    assert 'd\ne\nf\n\n' in gemini.prompts[1]
+    assert result.response == 'synthesis'
+    assert result.chunks_processed == 2
+    assert result.total_tokens == 15
+    assert result.content == ''
+
+
+@pytest.mark.asyncio
+async def test_oversized_section_is_split_using_its_filename(
+    analyzer: LargeContextAnalyzer, gemini: FakeGemini, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    split_filenames: list[str] = []
+
+    def smart_chunk_content(content: str, filename: str, chunk_size: int) -> list[tuple[str, int, int]]:
+        split_filenames.append(filename)
+        return [('first half', 0, 1), ('second half', 2, 3)]
+
+    monkeypatch.setattr(large_context_analyzer, 'smart_chunk_content', smart_chunk_content)
+    sections = [('overview\n', 2), ('def f():\n    ...\n\ndef g():\n    ...\n', 20)]
+
+    result = await analyzer.analyze_sections('query', sections, filenames=['overview.md', 'src/module.py'])
+
+    assert split_filenames == ['src/module.py']
+    # The split pieces are numbered from the line the oversized section starts on
+    assert gemini.chunk_line_ranges() == [(0, 0), (1, 2), (3, 4)]
+    assert result.chunks_processed == 3
+
+
+@pytest.mark.asyncio
+async def test_repeated_analysis_is_served_from_cache(analyzer: LargeContextAnalyzer, gemini: FakeGemini) -> None:
+    sections = [('a\n', 8), ('b\n', 8)]
+
+    first = await analyzer.analyze_sections('query', sections)
+    prompt_count = len(gemini.prompts)
+    second = await analyzer.analyze_sections('query', sections)
+
+    assert len(gemini.prompts) == prompt_count
+    assert second == first
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(('fail_on', 'persisted'), [(None, True), ('beta', False)], ids=['complete', 'failed-chunk'])
+async def test_only_complete_analyses_are_written_to_disk(
+    analyzer: LargeContextAnalyzer, gemini: FakeGemini, tmp_path: Path, fail_on: str | None, persisted: bool
+) -> None:
+    analyzer.disk_cache = DiskResultCache(CacheSettings(directory=tmp_path))
+    gemini.fail_on = fail_on
+    sections = [('alpha\n', 8), ('beta\n', 8)]
+
+    result = await analyzer.analyze_sections('query', sections)
+    assert result.response == 'synthesis'
+    # Either way the result is served from memory
+    assert await analyzer.analyze_sections('query', sections) is result
+
+    analyzer.cache.clear()
+    prompt_count = len(gemini.prompts)
+    await analyzer.analyze_sections('query', sections)
+
+    assert (len(gemini.prompts) == prompt_count) is persisted
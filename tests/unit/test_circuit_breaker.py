@@ -0,0 +1,253 @@
+"""Unit tests for the Gemini circuit breaker."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from google.genai.errors import ClientError
+
+from gemini_claude_code_mcp.services import gemini
+from gemini_claude_code_mcp.services.gemini import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    """Clock for a CircuitBreaker that only moves when the test advances it."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.threshold):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_closed_breaker_opens_after_threshold_failures(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=3, cooldown=30.0, clock=clock)
+
+    for _ in range(2):
+        assert breaker.allow() is False
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_success_resets_consecutive_failures(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=2, cooldown=30.0, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_lets_one_probe_through_after_cooldown(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+
+    clock.now += 29.0
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock.now += 1.0
+    assert breaker.allow() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Everyone else fails fast while the probe is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_successful_probe_closes_breaker(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    clock.now += 30.0
+    breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() is False
+
+
+def test_failed_probe_reopens_breaker_for_a_full_cooldown(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=3, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    clock.now += 30.0
+    breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    clock.now += 30.0
+    assert breaker.allow() is True
+
+
+def test_released_probe_hands_the_slot_to_the_next_caller(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    clock.now += 30.0
+    breaker.allow()
+
+    breaker.release_probe()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is True
+
+
+def test_release_probe_keeps_a_settled_outcome(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    clock.now += 30.0
+    breaker.allow()
+    breaker.record_success()
+
+    breaker.release_probe()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+class FakeModels:
+    """Replacement for `client.aio.models` whose stream behaviour is set per test."""
+
+    def __init__(self, stream: Any) -> None:
+        self.stream = stream
+
+    async def generate_content_stream(self, **kwargs: Any) -> AsyncIterator[Any]:
+        return self.stream()
+
+
+@pytest.fixture
+def half_open_breaker(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> CircuitBreaker:
+    """Install an OPEN breaker whose cooldown has elapsed, so the next Gemini call is the probe."""
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    clock.now += 30.0
+
+    def get_circuit_breaker(model: str) -> CircuitBreaker:
+        return breaker
+
+    monkeypatch.setattr(gemini, 'get_circuit_breaker', get_circuit_breaker)
+    monkeypatch.setattr(gemini, 'check_rate_limit', _no_rate_limit)
+    return breaker
+
+
+async def _no_rate_limit() -> None:
+    return None
+
+
+def use_stream(monkeypatch: pytest.MonkeyPatch, stream: Any) -> None:
+    client = type('FakeClient', (), {'aio': type('FakeAio', (), {'models': FakeModels(stream)})()})()
+    monkeypatch.setattr(gemini, 'get_gemini_client', lambda: client)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ('code', 'expected_state'), [(400, CircuitBreaker.CLOSED), (429, CircuitBreaker.OPEN)], ids=['400', '429']
+)
+async def test_client_error_settles_probe(
+    half_open_breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch, code: int, expected_state: str
+) -> None:
+    async def stream() -> AsyncIterator[Any]:
+        raise ClientError(code, {'error': {'message': 'rejected', 'status': 'REJECTED'}})
+        yield
+
+    use_stream(monkeypatch, stream)
+
+    with pytest.raises(ClientError):
+        await gemini.gemini_text_to_text('prompt', max_retries=1)
+
+    assert half_open_breaker.state == expected_state
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_releases_probe(
+    half_open_breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def stream() -> AsyncIterator[Any]:
+        raise ValueError('malformed chunk')
+        yield
+
+    use_stream(monkeypatch, stream)
+
+    assert await gemini.gemini_text_to_text('prompt', max_retries=1) is None
+    assert half_open_breaker.state == CircuitBreaker.OPEN
+    assert half_open_breaker.allow() is True
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_early_releases_probe(
+    half_open_breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def stream() -> AsyncIterator[Any]:
+        yield type('Chunk', (), {'text': 'partial'})()
+        yield type('Chunk', (), {'text': 'rest'})()
+
+    use_stream(monkeypatch, stream)
+
+    responses = gemini.gemini_text_to_text_stream('prompt', max_retries=1)
+    assert await anext(responses) == 'partial'
+    await responses.aclose()
+
+    assert half_open_breaker.state == CircuitBreaker.OPEN
+    assert half_open_breaker.allow() is True
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released(half_open_breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch) -> None:
+    started = asyncio.Event()
+
+    async def stream() -> AsyncIterator[Any]:
+        started.set()
+        await asyncio.Event().wait()
+        yield
+
+    use_stream(monkeypatch, stream)
+
+    task = asyncio.create_task(gemini.gemini_text_to_text('prompt', max_retries=1))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert half_open_breaker.state == CircuitBreaker.OPEN
+    assert half_open_breaker.allow() is True
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_without_calling_gemini(
+    clock: FakeClock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0, clock=clock)
+    open_breaker(breaker)
+    calls: list[int] = []
+
+    def get_circuit_breaker(model: str) -> CircuitBreaker:
+        return breaker
+
+    monkeypatch.setattr(gemini, 'get_circuit_breaker', get_circuit_breaker)
+
+    async def stream() -> AsyncIterator[Any]:
+        calls.append(1)
+        yield
+
+    use_stream(monkeypatch, stream)
+
+    assert await gemini.gemini_text_to_text('prompt', max_retries=1) is None
+    assert calls == []
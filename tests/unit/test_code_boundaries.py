@@ -0,0 +1,72 @@
+"""Unit tests for finding code boundaries."""
+
+import re
+
+import pytest
+
+from gemini_claude_code_mcp.utils.chunking import CODE_BOUNDARY_PATTERNS, find_code_boundaries
+
+JAVA_SAMPLE = """\
+package com.example;
+
+public class Greeter {
+    private final String name;
+
+    public Greeter(String name) {
+        this.name = name;
+    }
+
+    static void main(String[] args) {
+        System.out.println(args.length);
+    }
+    void greet() {
+        System.out.println(name);
+    }
+}
+
+class Helper {
+}
+"""
+
+CPP_SAMPLE = """\
+#include <iostream>
+
+struct Point {
+    int x;
+    int y;
+};
+
+class Shape {
+};
+static inline int
+square(int x) {
+    return x * x;
+}
+
+int main(int argc, char** argv) {
+    std::cout << square(argc) << std::endl;
+    return 0;
+}
+"""
+
+
+def scan_each_pattern(content: str, language: str) -> list[tuple[int, int]]:
+    """The scan find_code_boundaries replaced: each pattern separately, line numbers from the prefix."""
+    boundaries: list[tuple[int, int]] = []
+    for pattern in CODE_BOUNDARY_PATTERNS[language]:
+        for match in re.finditer(pattern, content, re.MULTILINE):
+            boundaries.append((content[: match.start()].count('\n'), match.start()))
+    return sorted(set(boundaries))
+
+
+@pytest.mark.parametrize(
+    ('content', 'language', 'lines'),
+    [(JAVA_SAMPLE, 'java', [2, 5, 9, 12, 17]), (CPP_SAMPLE, 'cpp', [2, 7, 14])],
+    ids=['java', 'cpp'],
+)
+def test_single_pass_finds_the_boundaries_of_each_pattern(content: str, language: str, lines: list[int]) -> None:
+    boundaries = find_code_boundaries(content, language)
+
+    assert boundaries == scan_each_pattern(content, language)
+    # Each boundary is on the declaration line itself, not on a blank line above it
+    assert [line for line, _ in boundaries] == lines
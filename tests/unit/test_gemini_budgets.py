@@ -0,0 +1,93 @@
+"""Unit tests for the Gemini retry budget and rate limiter."""
+
+import pytest
+
+from gemini_claude_code_mcp.config.settings import get_settings
+from gemini_claude_code_mcp.services import gemini
+from gemini_claude_code_mcp.services.gemini import RateLimitState, RetryBudget
+
+
+def test_retry_budget_is_exhausted_after_capacity_retries() -> None:
+    budget = RetryBudget(capacity=3.0, tokens=3.0)
+
+    assert [budget.consume() for _ in range(4)] == [True, True, True, False]
+    assert budget.tokens == 0.0
+
+
+def test_successes_earn_retries_back() -> None:
+    budget = RetryBudget(capacity=3.0, success_deposit=0.5, tokens=0.0)
+
+    budget.deposit()
+    assert budget.consume() is False
+    budget.deposit()
+    assert budget.consume() is True
+
+
+def test_deposit_is_capped_at_capacity() -> None:
+    budget = RetryBudget(capacity=2.0, success_deposit=0.5, tokens=1.8)
+
+    budget.deposit()
+
+    assert budget.tokens == 2.0
+
+
+class FakeTime:
+    """Clock and sleep for a RateLimitState: sleeping only moves the clock and records the wait."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def fake_time(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    """Install a fresh full bucket of 2 requests per 10 seconds, driven by a fake clock."""
+    fake = FakeTime()
+    monkeypatch.setattr(get_settings(), 'rate_limit_requests', 2)
+    monkeypatch.setattr(get_settings(), 'rate_limit_window', 10)
+    monkeypatch.setattr(
+        gemini,
+        'rate_limit_state',
+        RateLimitState(tokens=2.0, last_refill=fake.now, clock=fake.monotonic, sleep=fake.sleep),
+    )
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_full_bucket_admits_a_burst_without_waiting(fake_time: FakeTime) -> None:
+    await gemini.check_rate_limit()
+    await gemini.check_rate_limit()
+
+    assert fake_time.sleeps == []
+    assert gemini.rate_limit_state.tokens == 0.0
+
+
+@pytest.mark.asyncio
+async def test_empty_bucket_waits_only_for_the_next_token(fake_time: FakeTime) -> None:
+    await gemini.check_rate_limit()
+    await gemini.check_rate_limit()
+    fake_time.now += 2.0  # Refills 0.4 of a token at 0.2 tokens per second
+
+    await gemini.check_rate_limit()
+
+    assert fake_time.sleeps == [pytest.approx(3.0)]
+    assert gemini.rate_limit_state.tokens == pytest.approx(0.0)
+
+
+@pytest.mark.asyncio
+async def test_idle_time_refills_up_to_capacity(fake_time: FakeTime) -> None:
+    await gemini.check_rate_limit()
+    await gemini.check_rate_limit()
+    fake_time.now += 60.0
+
+    await gemini.check_rate_limit()
+
+    assert fake_time.sleeps == []
+    assert gemini.rate_limit_state.tokens == 1.0
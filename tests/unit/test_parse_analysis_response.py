@@ -0,0 +1,63 @@
+"""Unit tests for parsing the summarize_project analysis response."""
+
+# pyright: reportPrivateUsage=false
+
+from gemini_claude_code_mcp.tools.summarize_project_tool import _parse_analysis_response
+
+NUMBERED_RESPONSE = """\
+Here is the project summary.
+
+1. **Overview**
+A command line tool
+for summarizing projects.
+
+2. **Technology Stack**
+Python 3.12, FastMCP
+
+3. **Architecture**
+Tools delegate to services.
+
+4. **Main Components**
+- main.py
+- services/gemini.py
+
+5. **Key Features**
+- Chunked analysis
+
+6. **Dependencies**
+- fastmcp
+- google-genai
+
+7. **Code Quality**
+Typed and linted.
+"""
+
+
+def test_parses_numbered_section_headers() -> None:
+    sections = _parse_analysis_response(NUMBERED_RESPONSE)
+
+    assert sections == {
+        'overview': 'A command line tool\nfor summarizing projects.',
+        'tech_stack': 'Python 3.12, FastMCP',
+        'architecture': 'Tools delegate to services.',
+        'components': ['- main.py', '- services/gemini.py'],
+        'key_features': ['- Chunked analysis'],
+        'dependencies': ['- fastmcp', '- google-genai'],
+        'code_quality': 'Typed and linted.',
+    }
+
+
+def test_missing_sections_keep_their_type() -> None:
+    sections = _parse_analysis_response('**Main Components**\n- main.py\n')
+
+    assert sections['components'] == ['- main.py']
+    for key in ('overview', 'tech_stack', 'architecture', 'code_quality'):
+        assert sections[key] == ''
+    assert sections['key_features'] == []
+    assert sections['dependencies'] == []
+
+
+def test_unstructured_response_becomes_the_overview() -> None:
+    response = 'Just some prose about the project.'
+
+    assert _parse_analysis_response(response)['overview'] == response
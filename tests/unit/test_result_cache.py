@@ -0,0 +1,97 @@
+"""Unit tests for the disk-persistent analysis result cache."""
+
+from pathlib import Path
+from typing import Literal
+
+import pytest
+
+from gemini_claude_code_mcp.config.settings import CacheSettings
+from gemini_claude_code_mcp.services.result_cache import DiskResultCache
+
+
+class FakeClock:
+    """Clock for a DiskResultCache that only moves when the test advances it."""
+
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def make_cache(
+    directory: Path,
+    clock: FakeClock,
+    ttl: int = 3600,
+    max_size_bytes: int = 1024,
+    eviction_policy: Literal['lru', 'lfu', 'fifo'] = 'lru',
+) -> DiskResultCache:
+    return DiskResultCache(
+        CacheSettings(
+            directory=directory, ttl=ttl, max_size_gb=max_size_bytes / 1024**3, eviction_policy=eviction_policy
+        ),
+        clock=clock,
+    )
+
+
+def test_values_round_trip_and_survive_a_new_instance(tmp_path: Path, clock: FakeClock) -> None:
+    make_cache(tmp_path, clock).set('key', 'value')
+
+    assert make_cache(tmp_path, clock).get('key') == 'value'
+    assert make_cache(tmp_path, clock).get('other') is None
+
+
+def test_expired_entries_are_misses(tmp_path: Path, clock: FakeClock) -> None:
+    cache = make_cache(tmp_path, clock, ttl=60)
+    cache.set('key', 'value')
+
+    clock.now += 60.0
+    assert cache.get('key') == 'value'
+    clock.now += 1.0
+    assert cache.get('key') is None
+
+
+@pytest.mark.parametrize(
+    ('eviction_policy', 'evicted'), [('lru', 'b'), ('lfu', 'c'), ('fifo', 'a')], ids=['lru', 'lfu', 'fifo']
+)
+def test_size_bound_evicts_by_policy(
+    tmp_path: Path, clock: FakeClock, eviction_policy: Literal['lru', 'lfu', 'fifo'], evicted: str
+) -> None:
+    cache = make_cache(tmp_path, clock, max_size_bytes=300, eviction_policy=eviction_policy)
+    for key in 'abc':
+        clock.now += 1.0
+        cache.set(key, key * 100)
+    # a was stored first, b was read least recently and c least often
+    for key in 'bbcaa':
+        clock.now += 1.0
+        cache.get(key)
+
+    clock.now += 1.0
+    cache.set('d', 'd' * 100)
+
+    remaining = {key for key in 'abcd' if cache.get(key) is not None}
+    assert remaining == set('abcd') - {evicted}
+
+
+def test_value_larger_than_the_cache_is_not_stored(tmp_path: Path, clock: FakeClock) -> None:
+    cache = make_cache(tmp_path, clock, max_size_bytes=100)
+    cache.set('small', 'x')
+
+    cache.set('large', 'x' * 101)
+
+    assert cache.get('large') is None
+    assert cache.get('small') == 'x'
+
+
+def test_database_errors_are_cache_misses(tmp_path: Path, clock: FakeClock) -> None:
+    cache = make_cache(tmp_path, clock)
+    cache.path.write_bytes(b'not a database' * 100)
+
+    cache.set('key', 'value')
+
+    assert cache.get('key') is None